@@ -1,153 +1,139 @@
 import os
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
+from code.analysis_logic import top_customers_by_payments, invoice_payment_status, revenue_by_department, average_payment
+from code.money_logic import get_money_mode
+from code.query_cache import QueryCache
+from code.report_logic import payment_trend_chart, draw_chart, render_chart
+from code.shard_logic import get_gold_db_paths, open_gold_connections, get_combined_gold_version
 
 # Load environment variables
 load_dotenv('variables.env')
 
 # Folder Paths
 DB_PATH = os.getenv('DB_PATH')
+QUERY_CACHE_FOLDER = os.getenv('QUERY_CACHE_FOLDER')
+REPORTS_FOLDER = os.getenv('REPORTS_FOLDER', './reports/')
 
-conn = None                                              # In case something happens in the middle of the try block.
-try:
-    # Connect to database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-
-    # ----------------
-    # Question 1: What are the top 5 customers by total amount paid? (SQL)
-    # ----------------
-    print("\nQuestion 1: Top 5 customers by total payments:")
-    print("\nRationale: This tells us who our most valuable customers are — important for customer relationship management and potential upsell opportunities.\n")
-
-    query1 = """
-    SELECT 
-        c.first_name || ' ' || c.last_name AS customer_name,
-        SUM(p.amount_paid) AS total_paid,
-        COUNT(i.invoice_id) as invoices,
-        ROUND(SUM(p.amount_paid) / COUNT(i.invoice_id), 2) as average_per_invoice
-    FROM payments p
-    JOIN invoices i ON p.invoice_id = i.invoice_id
-    JOIN customers c ON i.customer_id = c.customer_id
-    GROUP BY c.customer_id
-    ORDER BY total_paid DESC
-    LIMIT 5;
-    """
-
-    # Execute and display
-    q1_result = pd.read_sql_query(query1, conn)
-    print(q1_result)
-    print("----------------------------------------------------------------------------------------------------------------------------------")
-
-
-    # ----------------
-    # Question 2: How many invoices are underpaid, exact paid, and overpaid? (SQL)
-    # ----------------
-    print("\nQuestion 2: Invoice Payment Status (Under Paid, Exact Paid, Over Paid)")
-    print("\nRationale: Understanding payment behavior helps detect billing issues, customer payment trends, and possible accounting errors.\n")
-
-    # Connect to database again
-    conn = sqlite3.connect(DB_PATH)
-
-    query2 = """
-    WITH classified_invoices as (
-        SELECT
-            invoice_id, customer_id, department_id, invoice_type, invoice_date, due_date, amount_due, amount_paid, balance, status,
-            CASE 
-                WHEN balance > 0 THEN 'under_paid'
-                WHEN balance = 0 THEN 'exact_paid'
-                WHEN balance < 0 THEN 'over_paid'
-            END AS invoice_payment_status
-        FROM invoices
-        WHERE status IN ('Posted', 'Pending', 'Processing', 'Late')                           -- Exclude Cancelled invoices
-    )
-    
-    SELECT invoice_payment_status, CAST(SUM(balance) AS BIGINT) as outstanding_balance, COUNT(invoice_id) as count
-    FROM classified_invoices
-    GROUP BY invoice_payment_status
-    ORDER BY 3 DESC;
-    """
-
-    q2_result = pd.read_sql_query(query2, conn)
-    print(q2_result)
-    print("----------------------------------------------------------------------------------------------------------------------------------")
-
-
-    # ----------------
-    # Question 3: What is the total revenue per department? (SQL)
-    # ----------------
-    print("\nQuestion 3: Total revenue by department")
-    print("\nRationale: Understanding which departments drive the most revenue helps prioritize resource allocation and strategic decisions.\n")
-
-    query3 = """
-    SELECT 
-        d.department_name,
-        SUM(p.amount_paid) AS total_revenue
-    FROM payments p
-    JOIN invoices i ON p.invoice_id = i.invoice_id
-    JOIN departments d ON i.department_id = d.department_id
-    GROUP BY d.department_id
-    ORDER BY total_revenue DESC;
-    """
-
-    q3_result = pd.read_sql_query(query3, conn)
-    print(q3_result)
-    print("----------------------------------------------------------------------------------------------------------------------------------")
+# Query Cache
+QUERY_CACHE_MEMORY_ENTRIES = int(os.getenv('QUERY_CACHE_MEMORY_ENTRIES', '64'))
+QUERY_CACHE_DISK_ENTRIES = int(os.getenv('QUERY_CACHE_DISK_ENTRIES', '256'))
 
+# Charts: upper bound on the points plotted per series
+REPORT_MAX_POINTS = int(os.getenv('REPORT_MAX_POINTS', '500'))
 
-    # ----------------
-    # Question 4: Average payment amount? (SQL)
-    # ----------------
-    print("\nQuestion 4: Average Payment Amount")
-    print("\nRationale: Knowing the average payment helps set realistic benchmarks and detect outliers.\n")
 
-    query4 = """
-    SELECT ROUND(AVG(amount_paid), 2) AS average_payment
-    FROM payments;
+def run_analysis() -> None:
     """
-    q4_result = pd.read_sql_query(query4, conn)
-    print(q4_result)
-    print("----------------------------------------------------------------------------------------------------------------------------------")
-
-
-    # ----------------
-    # Question 5: What is the distribution of payments over time? (Python - pandas/matplotlib)
-    # ----------------
-    print("\nQuestion 5: Payment amount trends over time")
-    print("\nRationale: Analyzing daily payment trends helps identify seasonality, payment patterns, or potential anomalies.\n")
-
-    query5 = """
-    SELECT 
-        payment_date, 
-        SUM(amount_paid) AS daily_total
-    FROM payments
-    GROUP BY payment_date
-    ORDER BY payment_date;
+    Execute the sample business queries against the gold layer and plot payment trends.
+
+    With GOLD_SHARD_COUNT > 1 every query fans out to all gold shards and the partial aggregates are merged (see code/analysis_logic.py).
+    Query results are read through the query cache, so repeated runs are served from memory/disk until
+         the gold loader lands new data and bumps the gold version.
+    Without a display (e.g. on a server), the payment trends chart is saved under REPORTS_FOLDER instead of shown.
     """
-    payments_over_time = pd.read_sql_query(query5, conn)
-
-    # Convert payment_date (TEXT) to pandas datetime
-    payments_over_time['payment_date'] = pd.to_datetime(payments_over_time['payment_date'])
-
-    # Plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(payments_over_time['payment_date'], payments_over_time['daily_total'], marker='o')
-    plt.title('Daily Payment Totals Over Time')
-    plt.xlabel('Date')
-    plt.ylabel('Total Payments')
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
-
-    print("----------------------------------------------------------------------------------------------------------------------------------")
-
-except Exception as e:
-    print(f"An error occurred during analysis execution: {e}")
-finally:
-    if conn:
-        conn.close()
-        print("Database connection closed.")
\ No newline at end of file
+
+    # Query cache: results are reused until the gold loader bumps the gold version.
+    cache = QueryCache(QUERY_CACHE_FOLDER, max_memory_entries=QUERY_CACHE_MEMORY_ENTRIES, max_disk_entries=QUERY_CACHE_DISK_ENTRIES,
+                       namespace=os.path.abspath(DB_PATH))
+
+    conn = None                                              # In case something happens in the middle of the try block.
+    gold_connections = []
+    try:
+        # Connect to database, and to every gold shard when sharded.
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        gold_paths = get_gold_db_paths(cursor, DB_PATH)
+        gold_connections = [conn] if gold_paths == [DB_PATH] else open_gold_connections(gold_paths)
+
+        # Current gold version (combined across shards). Every cached result below is keyed on it.
+        gold_version = get_combined_gold_version(gold_connections)
+
+        # Amounts are integer cents when the DB was created with MONEY_MODE=cents. The queries convert them back to dollars on the way out.
+        money_mode = get_money_mode(cursor)
+
+        # ----------------
+        # Question 1: What are the top 5 customers by total amount paid? (SQL)
+        # ----------------
+        print("\nQuestion 1: Top 5 customers by total payments:")
+        print("\nRationale: This tells us who our most valuable customers are — important for customer relationship management and potential upsell opportunities.\n")
+
+        # Execute and display
+        q1_result = top_customers_by_payments(gold_connections, money_mode, 5, cache, gold_version)
+        print(q1_result)
+        print("----------------------------------------------------------------------------------------------------------------------------------")
+
+
+        # ----------------
+        # Question 2: How many invoices are underpaid, exact paid, and overpaid? (SQL)
+        # ----------------
+        print("\nQuestion 2: Invoice Payment Status (Under Paid, Exact Paid, Over Paid)")
+        print("\nRationale: Understanding payment behavior helps detect billing issues, customer payment trends, and possible accounting errors.\n")
+
+        q2_result = invoice_payment_status(gold_connections, money_mode, cache, gold_version)
+        print(q2_result)
+        print("----------------------------------------------------------------------------------------------------------------------------------")
+
+
+        # ----------------
+        # Question 3: What is the total revenue per department? (SQL)
+        # ----------------
+        print("\nQuestion 3: Total revenue by department")
+        print("\nRationale: Understanding which departments drive the most revenue helps prioritize resource allocation and strategic decisions.\n")
+
+        q3_result = revenue_by_department(gold_connections, money_mode, cache, gold_version)
+        print(q3_result)
+        print("----------------------------------------------------------------------------------------------------------------------------------")
+
+
+        # ----------------
+        # Question 4: Average payment amount? (SQL)
+        # ----------------
+        print("\nQuestion 4: Average Payment Amount")
+        print("\nRationale: Knowing the average payment helps set realistic benchmarks and detect outliers.\n")
+
+        q4_result = average_payment(gold_connections, money_mode, cache, gold_version)
+        print(q4_result)
+        print("----------------------------------------------------------------------------------------------------------------------------------")
+
+
+        # ----------------
+        # Question 5: What is the distribution of payments over time? (Python - pandas/matplotlib)
+        # ----------------
+        print("\nQuestion 5: Payment amount trends over time")
+        print("\nRationale: Analyzing payment trends helps identify seasonality, payment patterns, or potential anomalies.\n")
+
+        # Summed per day, week or month depending on the history length, and downsampled to at most REPORT_MAX_POINTS points.
+        payments_over_time = payment_trend_chart(gold_connections, money_mode, None, None, REPORT_MAX_POINTS,
+                                                 os.path.join(REPORTS_FOLDER, "payment_trend.png"), cache, gold_version)
+
+        # Plot. matplotlib is imported here since it's by far the slowest import of the project.
+        import matplotlib.pyplot as plt
+        if payments_over_time is None:
+            print("No dated payments to plot.")
+        elif plt.get_backend().lower() == "agg":
+            # No display (e.g. on a server): write the chart to a file instead of blocking on plt.show().
+            os.makedirs(REPORTS_FOLDER, exist_ok=True)
+            print(f"Chart saved to {render_chart(payments_over_time)}")
+        else:
+            fig, ax = plt.subplots(figsize=(10, 6))
+            draw_chart(ax, payments_over_time)
+            fig.tight_layout()
+            plt.show()
+
+        print("----------------------------------------------------------------------------------------------------------------------------------")
+        print(f"Query cache: {cache.hits} hits, {cache.misses} misses (gold version {gold_version}).")
+
+    except Exception as e:
+        print(f"An error occurred during analysis execution: {e}")
+    finally:
+        for gold_conn in gold_connections:
+            if gold_conn is not conn:
+                gold_conn.close()
+        if conn:
+            conn.close()
+            print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    run_analysis()
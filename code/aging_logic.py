@@ -0,0 +1,133 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Optional
+from code.metadata_logic import get_metadata, set_metadata, bump_gold_version
+from code.money_logic import get_money_mode, money_sql
+
+# Aging buckets by days past due: (bucket, first day past due). "current" means not due yet.
+AGING_BUCKETS = [("current", None), ("0-30", 1), ("31-60", 31), ("61-90", 61), ("90+", 91)]
+
+# Days past due at which an invoice moves to the next bucket. Day 1 is also when it turns "Late".
+BUCKET_BOUNDARIES = [first_day for bucket, first_day in AGING_BUCKETS if first_day is not None]
+
+# Statuses that become "Late" once past due. Canceled invoices are never receivables.
+OPEN_STATUSES = ("Posted", "Pending", "Processing")
+
+
+def aging_bucket(days_past_due: int) -> str:
+    bucket_name = "current"
+    for bucket, first_day in AGING_BUCKETS[1:]:
+        if days_past_due >= first_day:
+            bucket_name = bucket
+    return bucket_name
+
+def to_iso_date(date_string: str) -> Optional[str]:
+    # Gold dates are stored as MM-DD-YYYY, which doesn't sort. The aging table keeps YYYY-MM-DD so due_on can be range-scanned.
+    try:
+        return datetime.strptime(date_string, "%m-%d-%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+def get_aging_as_of(cursor: sqlite3.Cursor) -> Optional[date]:
+    # Date of the last aging refresh. None until the first refresh ran.
+    as_of = get_metadata(cursor, "aging_as_of")
+    return datetime.strptime(as_of, "%Y-%m-%d").date() if as_of else None
+
+def mark_invoices_late(cursor: sqlite3.Cursor, invoice_ids: list[str]) -> int:
+    # Flip open invoices to "Late". Returns how many actually changed.
+    now = str(datetime.now().strftime("%m-%d-%Y-%H-%M-%S"))
+    cursor.executemany(f"""
+        UPDATE invoices
+        SET status = 'Late', updated_at = ?
+        WHERE invoice_id = ?
+            AND status IN ({','.join(['?'] * len(OPEN_STATUSES))})
+    """, [(now, invoice_id, *OPEN_STATUSES) for invoice_id in invoice_ids])
+    return cursor.rowcount
+
+def sync_invoice_aging(cursor: sqlite3.Cursor, invoice_id: str, as_of: Optional[date] = None) -> None:
+    # Bring one invoice's aging row in line with gold. Called by the gold loader after an invoice is inserted or paid.
+    cursor.execute("SELECT due_date, balance, status FROM invoices WHERE invoice_id = ?", (invoice_id,))
+    invoice = cursor.fetchone()
+    due_on = to_iso_date(invoice[0]) if invoice else None
+
+    # Not a receivable (missing, paid off, canceled or no usable due date): make sure it isn't aged.
+    if invoice is None or due_on is None or invoice[1] is None or invoice[1] <= 0 or invoice[2] == "Canceled":
+        cursor.execute("DELETE FROM invoice_aging WHERE invoice_id = ?", (invoice_id,))
+        return
+
+    # Age against the last refresh date so new rows agree with the rest of the table.
+    as_of = as_of or get_aging_as_of(cursor) or date.today()
+    days_past_due = (as_of - date.fromisoformat(due_on)).days
+
+    # The upsert fires the aging_buckets triggers, which keep the per-bucket totals up to date.
+    cursor.execute("""
+        INSERT INTO invoice_aging (invoice_id, due_on, balance, aging_bucket)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(invoice_id) DO UPDATE SET
+            due_on = excluded.due_on, balance = excluded.balance, aging_bucket = excluded.aging_bucket
+    """, (invoice_id, due_on, invoice[1], aging_bucket(days_past_due)))
+
+    if days_past_due >= 1:
+        mark_invoices_late(cursor, [invoice_id])
+
+def rebuild_invoice_aging(cursor: sqlite3.Cursor, as_of: date) -> int:
+    # Full rebuild. Only needed on the first refresh (or if the as-of date moved backwards).
+    cursor.execute("DELETE FROM invoice_aging")
+    cursor.execute("SELECT invoice_id FROM invoices WHERE balance > 0 AND status != 'Canceled'")
+    invoice_ids = [row[0] for row in cursor.fetchall()]
+    for invoice_id in invoice_ids:
+        sync_invoice_aging(cursor, invoice_id, as_of)
+    return len(invoice_ids)
+
+
+##### Main Functions #####
+def refresh_invoice_aging(conn: sqlite3.Connection, cursor: sqlite3.Cursor, as_of: Optional[date] = None) -> None:
+    # Move invoices between aging buckets as time passes, touching only the ones whose due date crossed a boundary
+    #      since the last refresh. An invoice crosses boundary b (days past due) between last_as_of and as_of when
+    #      last_as_of - b < due_on <= as_of - b, which is a range scan on idx_invoice_aging_due_on per boundary.
+    try:
+        as_of = as_of or date.today()
+        last_as_of = get_aging_as_of(cursor)
+
+        if last_as_of is None or as_of < last_as_of:
+            refreshed = rebuild_invoice_aging(cursor, as_of)
+            gold_changed = True
+            print(f"Aging rebuilt as of {as_of}: {refreshed} open invoices.")
+        else:
+            crossed = {}
+            for boundary in BUCKET_BOUNDARIES:
+                cursor.execute("""
+                    SELECT invoice_id, due_on FROM invoice_aging
+                    WHERE due_on > ? AND due_on <= ?
+                """, ((last_as_of - timedelta(days=boundary)).isoformat(), (as_of - timedelta(days=boundary)).isoformat()))
+                crossed.update(cursor.fetchall())
+
+            # Re-bucket the invoices that crossed, and turn the ones that just went past due "Late".
+            cursor.executemany("UPDATE invoice_aging SET aging_bucket = ? WHERE invoice_id = ?",
+                               [(aging_bucket((as_of - date.fromisoformat(due_on)).days), invoice_id) for invoice_id, due_on in crossed.items()])
+            late_invoices = mark_invoices_late(cursor, [invoice_id for invoice_id, due_on in crossed.items()
+                                                        if (as_of - date.fromisoformat(due_on)).days >= 1])
+            gold_changed = late_invoices > 0
+            print(f"Aging refreshed from {last_as_of} to {as_of}: {len(crossed)} invoices changed bucket, {late_invoices} marked Late.")
+
+        set_metadata(cursor, "aging_as_of", as_of.isoformat())
+
+        # Statuses changed in gold, so cached query results are stale.
+        if gold_changed:
+            bump_gold_version(cursor)
+
+        conn.commit()
+
+    except Exception as e:
+        print(f"Error: Database error in refresh_invoice_aging: {e}")
+        conn.rollback()
+
+def receivables_aging_report(cursor: sqlite3.Cursor) -> list[tuple]:
+    # Reads the running totals kept by the aging_buckets triggers: one row per bucket, no scan of invoices.
+    money_mode = get_money_mode(cursor)
+    cursor.execute(f"""
+        SELECT aging_bucket, invoice_count, ROUND({money_sql('outstanding_balance', money_mode)}, 2) AS outstanding_balance
+        FROM aging_buckets
+    """)
+    rows = dict((row[0], row) for row in cursor.fetchall())
+    return [rows[bucket] for bucket, first_day in AGING_BUCKETS if bucket in rows]
@@ -0,0 +1,211 @@
+import sqlite3
+import pandas as pd
+from typing import Any, Callable, Optional, Sequence
+from code.money_logic import money_sql
+from code.query_cache import QueryCache
+from code.shard_logic import fan_out_query, merge_partial_aggregates
+
+# Business queries over the gold layer. Every query runs against each gold DB (one, or every shard with GOLD_SHARD_COUNT > 1)
+#      and returns partial aggregates (sums, counts, per-shard top N) that are merged here. The merged result is cached,
+#      keyed on the query text, its parameters and the combined gold version.
+
+
+def cached_fan_out(cache: Optional[QueryCache], version: Any, connections: list[sqlite3.Connection], query: str, params: Sequence[Any],
+                   merge: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+    def compute() -> pd.DataFrame:
+        return merge(fan_out_query(connections, query, params))
+
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(query, params, version, compute)
+
+
+# ----------------
+# Question 1: What are the top N customers by total amount paid?
+# ----------------
+def top_customers_by_payments(connections: list[sqlite3.Connection], money_mode: str, limit: int = 5,
+                              cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    query = f"""
+    SELECT
+        c.first_name || ' ' || c.last_name AS customer_name,
+        {money_sql('SUM(p.amount_paid)', money_mode)} AS total_paid,
+        COUNT(i.invoice_id) as invoices
+    FROM payments p
+    JOIN invoices i ON p.invoice_id = i.invoice_id
+    JOIN customers c ON i.customer_id = c.customer_id
+    GROUP BY c.customer_id
+    ORDER BY total_paid DESC
+    LIMIT ?;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        # A customer's invoices all live in one shard, so the global top N is within the union of every shard's top N.
+        result = partials.sort_values("total_paid", ascending=False).head(limit).reset_index(drop=True)
+        result["average_per_invoice"] = (result["total_paid"] / result["invoices"]).round(2)
+        return result
+
+    return cached_fan_out(cache, version, connections, query, (limit,), merge)
+
+
+# ----------------
+# Question 2: How many invoices are underpaid, exact paid, and overpaid?
+# ----------------
+def invoice_payment_status(connections: list[sqlite3.Connection], money_mode: str,
+                           cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    query = f"""
+    WITH classified_invoices as (
+        SELECT
+            invoice_id, customer_id, department_id, invoice_type, invoice_date, due_date, amount_due, amount_paid, balance, status,
+            CASE
+                WHEN balance > 0 THEN 'under_paid'
+                WHEN balance = 0 THEN 'exact_paid'
+                WHEN balance < 0 THEN 'over_paid'
+            END AS invoice_payment_status
+        FROM invoices
+        WHERE status IN ('Posted', 'Pending', 'Processing', 'Late')                           -- Exclude Cancelled invoices
+    )
+
+    SELECT invoice_payment_status, {money_sql('SUM(balance)', money_mode)} as outstanding_balance, COUNT(invoice_id) as count
+    FROM classified_invoices
+    GROUP BY invoice_payment_status;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        # Sum the shard partials, then truncate to whole dollars once (same as CAST(... AS BIGINT) on a single DB).
+        result = merge_partial_aggregates(partials, ["invoice_payment_status"], ["outstanding_balance", "count"])
+        result["outstanding_balance"] = result["outstanding_balance"].astype("int64")
+        return result.sort_values("count", ascending=False).reset_index(drop=True)
+
+    return cached_fan_out(cache, version, connections, query, (), merge)
+
+
+# ----------------
+# Question 3: What is the total revenue per department?
+# ----------------
+def revenue_by_department(connections: list[sqlite3.Connection], money_mode: str,
+                          cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    # Grouped by name rather than id: department ids can differ between shards if a new department was added.
+    query = f"""
+    SELECT
+        d.department_name,
+        {money_sql('SUM(p.amount_paid)', money_mode)} AS total_revenue
+    FROM payments p
+    JOIN invoices i ON p.invoice_id = i.invoice_id
+    JOIN departments d ON i.department_id = d.department_id
+    GROUP BY d.department_name;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        result = merge_partial_aggregates(partials, ["department_name"], ["total_revenue"])
+        return result.sort_values("total_revenue", ascending=False).reset_index(drop=True)
+
+    return cached_fan_out(cache, version, connections, query, (), merge)
+
+
+# ----------------
+# Question 4: Average payment amount?
+# ----------------
+def average_payment(connections: list[sqlite3.Connection], money_mode: str,
+                    cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    # Averages don't merge, so every shard returns its sum and count instead.
+    query = f"""
+    SELECT {money_sql('SUM(amount_paid)', money_mode)} AS total_paid, COUNT(amount_paid) AS payments
+    FROM payments;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        payments = partials["payments"].sum()
+        average = round(partials["total_paid"].sum() / payments, 2) if payments else None
+        return pd.DataFrame({"average_payment": [average]})
+
+    return cached_fan_out(cache, version, connections, query, (), merge)
+
+
+# ----------------
+# Question 5: What is the distribution of payments over time?
+# ----------------
+def daily_payment_totals(connections: list[sqlite3.Connection], money_mode: str,
+                         cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    query = f"""
+    SELECT
+        payment_date,
+        {money_sql('SUM(amount_paid)', money_mode)} AS daily_total
+    FROM payments
+    GROUP BY payment_date;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        # Gold dates are MM-DD-YYYY text, so order by the parsed date rather than the string.
+        result = merge_partial_aggregates(partials, ["payment_date"], ["daily_total"])
+        result["payment_date"] = pd.to_datetime(result["payment_date"], format="%m-%d-%Y", errors="coerce")
+        return result.dropna(subset=["payment_date"]).sort_values("payment_date").reset_index(drop=True)
+
+    return cached_fan_out(cache, version, connections, query, (), merge)
+
+
+# ----------------
+# Lookup: balance of a single invoice
+# ----------------
+def invoice_balance(connections: list[sqlite3.Connection], money_mode: str, invoice_id: str,
+                    cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    # Primary key lookup. The invoice's shard isn't known from its id alone, so every shard is asked and at most one answers.
+    query = f"""
+    SELECT
+        invoice_id, customer_id, invoice_type, invoice_date, due_date, status, currency,
+        {money_sql('amount_due', money_mode)} AS amount_due,
+        {money_sql('amount_paid', money_mode)} AS amount_paid,
+        {money_sql('balance', money_mode)} AS balance
+    FROM invoices
+    WHERE invoice_id = ?;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        return partials.reset_index(drop=True)
+
+    return cached_fan_out(cache, version, connections, query, (invoice_id,), merge)
+
+
+# ----------------
+# Trends: payment totals per day, week or month over a date range (see code/report_logic.py)
+# ----------------
+# Gold dates are MM-DD-YYYY text ('N/A' when invalid). Bucketing is done in SQL on the ISO form, so every shard sends
+#      one row per bucket instead of one per day.
+PAYMENT_DATE_ISO_SQL = "substr(payment_date, 7, 4) || '-' || substr(payment_date, 1, 2) || '-' || substr(payment_date, 4, 2)"
+TREND_BUCKET_SQL = {
+    "day": PAYMENT_DATE_ISO_SQL,
+    "week": f"date({PAYMENT_DATE_ISO_SQL}, 'weekday 0', '-6 days')",                 # Monday of the week
+    "month": f"substr({PAYMENT_DATE_ISO_SQL}, 1, 7) || '-01'",
+}
+
+def payment_date_range(connections: list[sqlite3.Connection],
+                       cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    query = f"""
+    SELECT MIN({PAYMENT_DATE_ISO_SQL}) AS first_date, MAX({PAYMENT_DATE_ISO_SQL}) AS last_date
+    FROM payments
+    WHERE payment_date LIKE '__-__-____';
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame({"first_date": [partials["first_date"].min()], "last_date": [partials["last_date"].max()]})
+
+    return cached_fan_out(cache, version, connections, query, (), merge)
+
+def payment_totals_by_bucket(connections: list[sqlite3.Connection], money_mode: str, bucket: str, start: str, end: str,
+                             cache: Optional[QueryCache] = None, version: Any = 0) -> pd.DataFrame:
+    # start/end are ISO dates (inclusive). Buckets are labeled by their first day.
+    query = f"""
+    SELECT
+        {TREND_BUCKET_SQL[bucket]} AS bucket_start,
+        {money_sql('SUM(amount_paid)', money_mode)} AS total_paid,
+        COUNT(*) AS payments
+    FROM payments
+    WHERE payment_date LIKE '__-__-____' AND {PAYMENT_DATE_ISO_SQL} BETWEEN ? AND ?
+    GROUP BY bucket_start;
+    """
+
+    def merge(partials: pd.DataFrame) -> pd.DataFrame:
+        result = merge_partial_aggregates(partials, ["bucket_start"], ["total_paid", "payments"])
+        result["bucket_start"] = pd.to_datetime(result["bucket_start"], format="%Y-%m-%d", errors="coerce")
+        return result.dropna(subset=["bucket_start"]).sort_values("bucket_start").reset_index(drop=True)
+
+    return cached_fan_out(cache, version, connections, query, (start, end), merge)
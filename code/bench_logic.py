@@ -0,0 +1,29 @@
+import sys
+import time
+import statistics
+import subprocess
+
+
+def time_command(command: list[str]) -> float:
+    # Wall time of a single run, in milliseconds.
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_startup(main_path: str, subcommands: list[str], repeat: int) -> dict[str, float]:
+    # Baseline: a bare interpreter. Everything above it is import overhead of the subcommand.
+    baseline_ms = statistics.median(time_command([sys.executable, "-c", "pass"]) for _ in range(repeat))
+
+    results = {}
+    for subcommand in subcommands:
+        runs = [time_command([sys.executable, main_path, "--startup-only", subcommand]) for _ in range(repeat)]
+        results[subcommand] = statistics.median(runs)
+
+    # Display
+    print(f"Startup time per subcommand (median of {repeat} runs, bare interpreter = {baseline_ms:.0f} ms):")
+    print(f"{'subcommand':<14}{'startup_ms':>12}{'overhead_ms':>14}")
+    for subcommand, startup_ms in results.items():
+        print(f"{subcommand:<14}{startup_ms:>12.0f}{startup_ms - baseline_ms:>14.0f}")
+
+    return results
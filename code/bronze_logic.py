@@ -1,10 +1,24 @@
+from __future__ import annotations
 import os
 import sqlite3
-import pandas as pd
 from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+from code.dedup_logic import BloomFilter, load_row_filter, drop_duplicate_rows
+
+# pandas is only needed for ingestion. Keeping it out of module load keeps "init-schema" fast.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns stored as lookup ids in the compact bronze tables (BRONZE_STORAGE_MODE=compact).
+COMPACT_LOOKUP_COLUMNS = {
+    "bronze_invoices": ["invoice_type", "currency", "status"],
+    "bronze_payments": [],
+}
 
 
 def load_csv_to_df(path: str) -> pd.DataFrame:
+    import pandas as pd
+
     # Read path and add load timestamp for historical purpose.
     try:
         df = pd.read_csv(path)
@@ -14,7 +28,7 @@ def load_csv_to_df(path: str) -> pd.DataFrame:
         print(f"Error: Couldn't load CSV at {path}: {e}")
         return pd.DataFrame()  # Return empty DataFrame on error
 
-def insert_data(conn: sqlite3.Connection, df: pd.DataFrame, table_name: str) -> None:
+def insert_data(conn: sqlite3.Connection, df: pd.DataFrame, table_name: str) -> bool:
     try:
         # Directly insert the DataFrame into the bronze table without checking existing IDs
         if len(df) > 0:
@@ -22,10 +36,36 @@ def insert_data(conn: sqlite3.Connection, df: pd.DataFrame, table_name: str) ->
             print(f"Inserted {len(df)} records into {table_name}.")
         else:
             print(f"No new records to insert into {table_name}.")
+        return True
     except Exception as e:
         print(f"Error: Couldnt inserting data into {table_name}: {e}")
+        return False
+
+def get_or_create_lookup_ids(cursor: sqlite3.Cursor, column_name: str, values: list[str]) -> dict[str, int]:
+    # Dictionary encoding for the compact bronze tables: one row per distinct (column, value), ids reused across loads.
+    cursor.executemany("INSERT OR IGNORE INTO bronze_lookup_values (column_name, lookup_value) VALUES (?, ?)",
+                       [(column_name, value) for value in values])
+    cursor.execute("SELECT lookup_value, lookup_id FROM bronze_lookup_values WHERE column_name = ?", (column_name,))
+    return dict(cursor.fetchall())
+
+def encode_compact(cursor: sqlite3.Cursor, df: pd.DataFrame, table_name: str, file_path: str) -> pd.DataFrame:
+    # Replace the repeated load_timestamp with a reference to a single load batch row.
+    cursor.execute("INSERT INTO bronze_load_batches (source_file, load_timestamp) VALUES (?, ?)",
+                   (os.path.basename(file_path), df["load_timestamp"].iloc[0]))
+    df = df.drop(columns=["load_timestamp"])
+    df["batch_id"] = cursor.lastrowid
+
+    # Swap the low-cardinality text columns for their lookup ids. Missing values stay NULL.
+    for column_name in COMPACT_LOOKUP_COLUMNS.get(table_name, []):
+        values = [str(value) for value in df[column_name].dropna().unique()]
+        lookup_ids = get_or_create_lookup_ids(cursor, column_name, values)
+        df[f"{column_name}_id"] = df[column_name].astype("string").map(lookup_ids)
+        df = df.drop(columns=[column_name])
+
+    return df
 
-def process_file(conn: sqlite3.Connection, cursor: sqlite3.Cursor, file_path: str) -> None:
+def process_file(conn: sqlite3.Connection, cursor: sqlite3.Cursor, file_path: str, BRONZE_STORAGE_MODE: str = "raw",
+                 row_filter: Optional[BloomFilter] = None) -> None:
     # Identify which file (invoice or payment) to load
     if "invoices" in file_path:
         table_name = "bronze_invoices"
@@ -37,11 +77,29 @@ def process_file(conn: sqlite3.Connection, cursor: sqlite3.Cursor, file_path: st
 
     # Load raw data into DataFrame
     df = load_csv_to_df(file_path)
-    if not df.empty:
-        insert_data(conn, df, table_name)
-    else:
+    if df.empty:
         print(f"Skipping empty file: {file_path}")
+        return
+
+    # Drop rows seen before (earlier in this file, or in any earlier file) before anything is written.
+    # Hashed on the raw columns, so a row is recognized whichever storage mode it was ingested in.
+    if row_filter is not None:
+        df, duplicates = drop_duplicate_rows(cursor, row_filter, df, table_name)
+        if duplicates:
+            print(f"Dropped {duplicates} duplicate rows from {os.path.basename(file_path)}.")
+        if df.empty:
+            conn.commit()
+            print(f"No new records to insert into {table_name}.")
+            return
 
+    # Compact mode: encode then write to the *_compact table instead.
+    if BRONZE_STORAGE_MODE == "compact":
+        df = encode_compact(cursor, df, table_name, file_path)
+        table_name = f"{table_name}_compact"
+
+    # The row hashes (and compact lookups) commit with the rows, or are rolled back with them.
+    if not insert_data(conn, df, table_name):
+        conn.rollback()
 
 
 ##### Main Functions #####
@@ -59,7 +117,15 @@ def check_or_create_tables(conn: sqlite3.Connection, cursor: sqlite3.Cursor, TAB
     else:
         print("Schema already exists. Skipping creation.")
 
-def ingestion_start(conn: sqlite3.Connection, cursor: sqlite3.Cursor, RAW_DATA_FOLDER: str, DB_PATH: str, TABLE_SETUP_PATH: str) -> None:
+def apply_schema_migrations(conn: sqlite3.Connection, SCHEMA_MIGRATIONS_PATH: str) -> None:
+    # Tables added after the original schema. Only IF NOT EXISTS / OR IGNORE statements, so it's safe to run every time:
+    #      existing databases pick up new tables without check_or_create_tables dropping and re-creating everything.
+    with open(SCHEMA_MIGRATIONS_PATH, "r") as f:
+        conn.executescript(f.read())
+
+def ingestion_start(conn: sqlite3.Connection, cursor: sqlite3.Cursor, RAW_DATA_FOLDER: str, DB_PATH: str, TABLE_SETUP_PATH: str,
+                    BRONZE_STORAGE_MODE: str = "raw", BRONZE_DEDUP_FILTER_PATH: Optional[str] = None,
+                    BRONZE_DEDUP_EXPECTED_ROWS: int = 10000000, BRONZE_DEDUP_FALSE_POSITIVE_RATE: float = 0.01) -> None:
     # Check paths
     if not os.path.exists(RAW_DATA_FOLDER):
         raise FileNotFoundError(f"Error: {RAW_DATA_FOLDER} not found.")
@@ -68,7 +134,14 @@ def ingestion_start(conn: sqlite3.Connection, cursor: sqlite3.Cursor, RAW_DATA_F
     elif not os.path.exists(TABLE_SETUP_PATH):
         raise FileNotFoundError(f"Error: {TABLE_SETUP_PATH} not found.")
 
+    # Duplicate filter, unless disabled (no path). Saved after each file so it never falls behind the committed index.
+    row_filter = None
+    if BRONZE_DEDUP_FILTER_PATH:
+        row_filter = load_row_filter(cursor, BRONZE_DEDUP_FILTER_PATH, BRONZE_DEDUP_EXPECTED_ROWS, BRONZE_DEDUP_FALSE_POSITIVE_RATE)
+
     # Load raw CSV files into DataFrames
     for filename in os.listdir(RAW_DATA_FOLDER):
         full_path = os.path.join(RAW_DATA_FOLDER, filename)
-        process_file(conn, cursor, full_path)
\ No newline at end of file
+        process_file(conn, cursor, full_path, BRONZE_STORAGE_MODE, row_filter)
+        if row_filter is not None:
+            row_filter.save(BRONZE_DEDUP_FILTER_PATH)
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import time
+import sqlite3
+
+
+def wal_size_bytes(db_path: str) -> int:
+    # Size of the DB's write-ahead log (0 when there is none, e.g. right after a truncating checkpoint).
+    try:
+        return os.path.getsize(db_path + "-wal")
+    except OSError:
+        return 0
+
+
+class CommitScheduler:
+    """
+    Commit interval and WAL checkpoint policy for long write loads (the gold load).
+
+    One transaction over a whole load holds the write lock from start to end, so any other writer (the aging refresh,
+         retention, an ad-hoc sqlite3 session) fails with "database is locked" once the load outlasts its busy timeout.
+         Its pages also can't be checkpointed until it commits, so the WAL grows with the size of the load and every reader
+         pays for the longer WAL index. Committing every commit_rows rows and/or commit_seconds seconds releases the lock
+         between batches (SQLite's busy handler polls, so a waiting writer gets in on some of them, not all) and lets the
+         WAL be checkpointed as the load goes.
+    SQLite's automatic (passive) checkpoints copy pages back but can only restart the WAL when no reader is using it,
+         which never happens with readers running back to back, so the file keeps growing. After a commit that leaves the
+         WAL over wal_limit_bytes, a TRUNCATE checkpoint waits (up to the busy timeout) for the current readers to finish,
+         then resets the WAL to zero bytes.
+    0 disables a setting. With everything at 0 the load is a single transaction, as before.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, commit_rows: int = 0, commit_seconds: float = 0.0, wal_limit_bytes: int = 0) -> None:
+        self.conn = conn
+        self.commit_rows = commit_rows
+        self.commit_seconds = commit_seconds
+        self.wal_limit_bytes = wal_limit_bytes
+        self.db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+
+        self.pending_rows = 0
+        self.last_commit = time.monotonic()
+        self.commits = 0
+        self.checkpoints = 0
+        self.busy_checkpoints = 0
+        self.wal_peak_bytes = 0
+
+    def due(self, rows: int = 1) -> bool:
+        # Count rows written since the last commit. True once the row or time interval is reached.
+        self.pending_rows += rows
+        return bool((self.commit_rows and self.pending_rows >= self.commit_rows)
+                    or (self.commit_seconds and time.monotonic() - self.last_commit >= self.commit_seconds))
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self.commits += 1
+        self.pending_rows = 0
+        self.last_commit = time.monotonic()
+
+        wal_bytes = wal_size_bytes(self.db_path)
+        self.wal_peak_bytes = max(self.wal_peak_bytes, wal_bytes)
+        if self.wal_limit_bytes and wal_bytes > self.wal_limit_bytes:
+            # Returns (busy, WAL frames, checkpointed frames). busy = 1: readers outlasted the timeout, retried after the next commit.
+            busy, log_frames, checkpointed_frames = self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            self.checkpoints += 1
+            self.busy_checkpoints += busy
+
+    def summary(self) -> str:
+        return f"{self.commits} commits, {self.checkpoints} checkpoints ({self.busy_checkpoints} busy), WAL peak {self.wal_peak_bytes / 1024 / 1024:.1f} MB"
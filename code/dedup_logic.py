@@ -0,0 +1,145 @@
+from __future__ import annotations
+import os
+import math
+import struct
+import hashlib
+import sqlite3
+from typing import TYPE_CHECKING, Optional
+from code.metadata_logic import get_metadata, set_metadata
+
+# pandas is only needed for ingestion, which already imports it.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns left out of a row's identity: the load timestamp differs for every resend of the same row.
+IGNORED_COLUMNS = ["load_timestamp"]
+BLOOM_FILE_HEADER = b"BLM1"
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter over row digests.
+
+    Memory is fixed at creation (bit_count bits), whatever the number of rows seen. It can answer "definitely new"
+         without touching the database. "Maybe seen" answers are confirmed against the exact bronze_row_hashes index,
+         so a false positive costs one lookup and never drops a row.
+    """
+
+    def __init__(self, bit_count: int, hash_count: int, bits: Optional[bytearray] = None, count: int = 0) -> None:
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, expected_items: int, false_positive_rate: float) -> BloomFilter:
+        # Standard sizing: m = -n ln(p) / ln(2)^2 bits, k = (m / n) ln(2) hashes.
+        bit_count = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        hash_count = max(1, round(bit_count / expected_items * math.log(2)))
+        return cls(bit_count, hash_count)
+
+    def _positions(self, digest: bytes) -> list[int]:
+        # Double hashing: k positions from two 64-bit halves of the (already uniform) row digest.
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return [(h1 + i * h2) % self.bit_count for i in range(self.hash_count)]
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def save(self, path: str) -> None:
+        # Temp file + rename, so a crash mid-write leaves the previous filter intact.
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(BLOOM_FILE_HEADER + struct.pack("<QQQ", self.bit_count, self.hash_count, self.count))
+            f.write(self.bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[BloomFilter]:
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(BLOOM_FILE_HEADER)) != BLOOM_FILE_HEADER:
+                    return None
+                bit_count, hash_count, count = struct.unpack("<QQQ", f.read(24))
+                bits = bytearray(f.read())
+            return cls(bit_count, hash_count, bits, count) if len(bits) == (bit_count + 7) // 8 else None
+        except (OSError, struct.error):
+            return None
+
+
+def row_digests(df: pd.DataFrame, table_name: str) -> list[bytes]:
+    # Normalize then hash each row: columns in name order, values stripped, missing values empty.
+    # The table name is part of the hash, so an invoice row and a payment row can never collide.
+    columns = sorted(column for column in df.columns if column not in IGNORED_COLUMNS)
+    normalized = df[columns].astype("string").fillna("")
+
+    digests = []
+    for row in normalized.itertuples(index=False, name=None):
+        text = table_name + "\x1e" + "\x1f".join(value.strip() for value in row)
+        digests.append(hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    return digests
+
+def known_digests(cursor: sqlite3.Cursor, digests: list[bytes]) -> set[bytes]:
+    # Exact confirmation of Bloom "maybe" answers, in chunks to stay under SQLite's variable limit.
+    known = set()
+    for start in range(0, len(digests), 500):
+        chunk = digests[start:start + 500]
+        cursor.execute(f"SELECT row_hash FROM bronze_row_hashes WHERE row_hash IN ({','.join(['?'] * len(chunk))})", chunk)
+        known.update(row[0] for row in cursor.fetchall())
+    return known
+
+
+##### Main Functions #####
+def load_row_filter(cursor: sqlite3.Cursor, BLOOM_PATH: str, expected_rows: int, false_positive_rate: float) -> BloomFilter:
+    # The filter must cover every hash in the exact index, or a resent row could slip through as "definitely new".
+    # Its count is checked against the index count kept in pipeline_metadata; on a mismatch (missing file, crash between
+    #      commit and save, DB re-created) it's rebuilt from the index.
+    indexed_rows = int(get_metadata(cursor, "bronze_row_hash_count", "0"))
+    bloom = BloomFilter.load(BLOOM_PATH)
+    if bloom is not None and bloom.count == indexed_rows:
+        return bloom
+
+    print(f"Rebuilding bronze duplicate filter from {indexed_rows} indexed rows.")
+    bloom = BloomFilter.for_capacity(max(expected_rows, indexed_rows), false_positive_rate)
+    cursor.execute("SELECT row_hash FROM bronze_row_hashes")
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        for row in rows:
+            bloom.add(row[0])
+    return bloom
+
+def drop_duplicate_rows(cursor: sqlite3.Cursor, bloom: BloomFilter, df: pd.DataFrame, table_name: str) -> tuple[pd.DataFrame, int]:
+    # Drop rows already ingested (in earlier files or earlier in this one) before they're written to bronze.
+    # New hashes are added to the index in the caller's transaction, so they commit (or roll back) with the rows.
+    digests = row_digests(df, table_name)
+
+    # Step 1: Rows the Bloom filter may have seen get confirmed against the exact index in one pass.
+    maybe_seen = [digest for digest in digests if bloom.might_contain(digest)]
+    confirmed = known_digests(cursor, maybe_seen) if maybe_seen else set()
+
+    # Step 2: Keep the first occurrence of every row that isn't confirmed.
+    keep = []
+    new_digests = []
+    seen_in_file = set()
+    for digest in digests:
+        is_duplicate = digest in confirmed or digest in seen_in_file
+        keep.append(not is_duplicate)
+        if not is_duplicate:
+            seen_in_file.add(digest)
+            new_digests.append(digest)
+
+    # Step 3: Record the new rows.
+    cursor.executemany("INSERT OR IGNORE INTO bronze_row_hashes (row_hash) VALUES (?)", [(digest,) for digest in new_digests])
+    set_metadata(cursor, "bronze_row_hash_count", str(int(get_metadata(cursor, "bronze_row_hash_count", "0")) + len(new_digests)))
+    for digest in new_digests:
+        bloom.add(digest)
+
+    return df[keep].reset_index(drop=True), len(digests) - len(new_digests)
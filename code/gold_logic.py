@@ -1,7 +1,14 @@
+import os
 import json
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
+from code.metadata_logic import bump_gold_version
+from code.money_logic import get_money_mode
+from code.aging_logic import get_aging_as_of, sync_invoice_aging
+from code.checkpoint_logic import CommitScheduler
+from code.shard_logic import shard_for_customer
 
 
 def safe_float(value: Any) -> float:
@@ -11,7 +18,20 @@ def safe_float(value: Any) -> float:
     except (TypeError, ValueError):
         return 0.0
 
-def insert_into_gold_customers(cursor: sqlite3.Cursor, customer_id: str, first_name: str, last_name: str, customer_email: str, customer_address: str) -> None:
+def safe_money(value: Any, money_mode: str = "float") -> Any:
+    # Float mode keeps the original safe_float behaviour. Cents mode only accepts whole cents and raises on anything else,
+    #      so a bad amount skips the row (and gets printed) instead of silently becoming 0.
+    if money_mode != "cents":
+        return safe_float(value)
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise ValueError(f"Invalid amount in cents: {value!r}")
+
+def insert_into_gold_customers(cursor: sqlite3.Cursor, customer_id: str, first_name: str, last_name: str, customer_email: str, customer_address: str) -> bool:
+    # Returns True once the customer is in gold (inserted now or already there), False on error.
     try:
         # If customer doesn't exist insert, else skip.
         cursor.execute("SELECT 1 FROM customers WHERE customer_id = ?", (customer_id,))
@@ -22,10 +42,12 @@ def insert_into_gold_customers(cursor: sqlite3.Cursor, customer_id: str, first_n
                 INSERT INTO customers (customer_id, first_name, last_name, customer_email, customer_address)
                 VALUES (?, ?, ?, ?, ?)
             """, (customer_id, first_name, last_name, customer_email, customer_address))
+        return True
     except sqlite3.Error as e:
         print(f"Error: Database error in insert_into_gold_customers: {e}")
     except Exception as e:
         print(f"Error: Unexpected error in insert_into_gold_customers: {e}")
+    return False
 
 def determine_gold_department_classification(cursor: sqlite3.Cursor, invoice_type: str, DEPARTMENT_MAPPINGS_PATH: str) -> int:
     try:
@@ -68,7 +90,8 @@ def determine_gold_department_classification(cursor: sqlite3.Cursor, invoice_typ
 
 
 def insert_into_gold_invoices(cursor: sqlite3.Cursor, invoice_id: str, customer_id: str, department_id: int, invoice_type: str, invoice_date: str, due_date: str,
-                              amount_due: Any, amount_paid: Any, balance: Any, currency: str, status: str) -> None:
+                              amount_due: Any, amount_paid: Any, balance: Any, currency: str, status: str, money_mode: str = "float") -> bool:
+    # Returns True once the invoice is in gold (inserted now or already there), False on error.
     try:
         # If invoice doesn't exist insert, else skip.
         cursor.execute("SELECT 1 FROM invoices WHERE invoice_id = ?", (invoice_id,))
@@ -89,109 +112,233 @@ def insert_into_gold_invoices(cursor: sqlite3.Cursor, invoice_id: str, customer_
                 )
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (invoice_id, customer_id, department_id, invoice_type, invoice_date, due_date,
-                  safe_float(amount_due), safe_float(amount_paid), safe_float(balance), currency, status, now, now, partition_key))
+                  safe_money(amount_due, money_mode), safe_money(amount_paid, money_mode), safe_money(balance, money_mode), currency, status, now, now, partition_key))
+        return True
     except sqlite3.Error as e:
         print(f"Database error in insert_into_gold_invoices: {e}")
     except Exception as e:
         print(f"Error: Unexpected error in insert_into_gold_invoices: {e}")
+    return False
 
-def insert_into_gold_payments(cursor: sqlite3.Cursor, payment_id: str, invoice_id: str, payment_date: str, amount_due: Any, amount_paid: Any) -> None:
+def insert_into_gold_payments(cursor: sqlite3.Cursor, payment_id: str, invoice_id: str, payment_date: str, amount_due: Any, amount_paid: Any,
+                              money_mode: str = "float") -> bool:
+    # Returns True once the payment is in gold (inserted now or already there), False on error.
     try:
         # If payment doesn't exist insert, else skip.
         cursor.execute("SELECT 1 FROM payments WHERE payment_id = ?", (payment_id,))
         exists = cursor.fetchone()
 
         if not exists:
+            # Calculate the balance first, so an invalid amount skips the payment before anything is written.
+            amount_paid = safe_money(amount_paid, money_mode)
+            balance = safe_money(amount_due, money_mode) - amount_paid
+
             cursor.execute("""
                 INSERT INTO payments (payment_id, invoice_id, payment_date, amount_paid)
                 VALUES (?, ?, ?, ?)
-            """, (payment_id, invoice_id, payment_date, safe_float(amount_paid)))
-
-            # Calculate the balance
-            balance = safe_float(amount_due) - safe_float(amount_paid)
+            """, (payment_id, invoice_id, payment_date, amount_paid))
 
             # Update the invoices table with the new amount_paid and balance
             cursor.execute("""
                 UPDATE invoices
                 SET amount_paid = ?, balance = ?
                 WHERE invoice_id = ?
-            """, (safe_float(amount_paid), safe_float(balance), invoice_id))
+            """, (amount_paid, balance, invoice_id))
+        return True
 
     except sqlite3.Error as e:
         print(f"Database error in insert_into_gold_payments: {e}")
     except Exception as e:
         print(f"Error: Unexpected error in insert_into_gold_payments: {e}")
+    return False
+
+
+def load_rows_into_gold(cursor: sqlite3.Cursor, silver_invoices: list[tuple], silver_payments: list[tuple], DEPARTMENT_MAPPINGS_PATH: str,
+                        scheduler: Optional[CommitScheduler] = None, mark_cleaned: bool = False) -> tuple[list[str], list[str]]:
+    # Insert silver rows into the gold tables the cursor points at (the main DB, or one gold shard).
+    # Returns the invoice and payment ids that made it into gold, so the caller marks only those cleaned in silver.
+    #      Rows that failed stay uncleaned and are retried by the next run.
+    # With a scheduler, the load commits at its intervals instead of once at the end. Rows are inserted only if missing,
+    #      so a load interrupted between commits is simply finished by the next run.
+
+    # Money mode the database was created with ("float" dollars or integer "cents").
+    money_mode = get_money_mode(cursor)
+
+    # New and paid invoices are aged against the last aging refresh (today if it never ran).
+    aging_as_of = get_aging_as_of(cursor) or datetime.today().date()
+
+    invoice_ids = []
+    payment_ids = []
+    committed = [0, 0]                                       # Invoices and payments already committed.
+
+    def commit_progress() -> None:
+        # Every commit bumps the gold version, so cached query results never outlive the data they were computed on.
+        # mark_cleaned: silver lives in the same DB (unsharded), so mark the committed rows cleaned in the same transaction.
+        bump_gold_version(cursor)
+        if mark_cleaned:
+            mark_silver_as_cleaned(cursor, invoice_ids[committed[0]:], payment_ids[committed[1]:])
+        scheduler.commit()
+        committed[0], committed[1] = len(invoice_ids), len(payment_ids)
+
+    # Step 1: Invoices
+    for invoice in silver_invoices:
+        # Grab invoice values
+        invoice_id, customer_id, first_name, last_name, customer_email, customer_address, invoice_type, invoice_date, due_date, amount_due, currency, status, is_cleaned = invoice
+
+        # Insert into customer
+        customer_loaded = insert_into_gold_customers(cursor, customer_id, first_name, last_name, customer_email, customer_address)
+
+        # Figure out department
+        department_id = determine_gold_department_classification(cursor, invoice_type, DEPARTMENT_MAPPINGS_PATH)
+
+        # Insert into invoice: Setting amount_paid = 0 and balance = amount_due, will come back later and update accordingly.
+        invoice_loaded = insert_into_gold_invoices(cursor, invoice_id, customer_id, department_id, invoice_type, invoice_date, due_date,
+                                                   amount_due, 0, amount_due, currency, status, money_mode)
+        if not (customer_loaded and invoice_loaded):
+            continue
+
+        # Add to receivables aging.
+        sync_invoice_aging(cursor, invoice_id, aging_as_of)
+
+        # Add to Batch.
+        invoice_ids.append(invoice_id)
+        if scheduler and scheduler.due():
+            commit_progress()
+
+    # Step 2: Payments
+    for payment in silver_payments:
+        # Grab payment values
+        payment_id, invoice_id, due_date, payment_date, amount_due, amount_paid, is_cleaned = payment
+
+        # Insert or update the payment in gold layer
+        if not insert_into_gold_payments(cursor, payment_id, invoice_id, payment_date, amount_due, amount_paid, money_mode):
+            continue
+
+        # Balance changed: move it within aging, or drop it from aging once paid off.
+        sync_invoice_aging(cursor, invoice_id, aging_as_of)
+
+        # Add to Batch.
+        payment_ids.append(payment_id)
+        if scheduler and scheduler.due():
+            commit_progress()
+
+    # Step 3: Bump the gold version stamp so cached query results are invalidated. Skipped when nothing new landed.
+    if invoice_ids or payment_ids:
+        bump_gold_version(cursor)
+
+    return invoice_ids, payment_ids
+
+def mark_silver_as_cleaned(cursor: sqlite3.Cursor, invoice_ids: list[str], payment_ids: list[str]) -> None:
+    # Batch Update is_cleaned to 1 for the new invoice and payments. Need to create placeholder list b/c needs to have dynamic '?'s.
+    if invoice_ids:
+        placeholders = ','.join(['?'] * len(invoice_ids))
+        cursor.execute(f"""
+            UPDATE silver_invoices 
+            SET is_cleaned = 1 
+            WHERE invoice_id IN ({placeholders}) 
+                AND is_cleaned = 0
+        """, invoice_ids)
+
+    if payment_ids:
+        placeholders = ','.join(['?'] * len(payment_ids))
+        cursor.execute(f"""
+            UPDATE silver_payments 
+            SET is_cleaned = 1 
+            WHERE payment_id IN ({placeholders}) 
+                AND is_cleaned = 0
+        """, payment_ids)
+
+def load_gold_shard(shard_path: str, silver_invoices: list[tuple], silver_payments: list[tuple], DEPARTMENT_MAPPINGS_PATH: str,
+                    GOLD_COMMIT_ROWS: int = 0, GOLD_COMMIT_SECONDS: float = 0.0, WAL_SIZE_LIMIT_MB: int = 0) -> tuple[list[str], list[str]]:
+    # Runs in its own process: one writer per shard file, so shards don't wait on each other's write lock.
+    conn = None
+    try:
+        conn = sqlite3.connect(shard_path)
+        cursor = conn.cursor()
+
+        scheduler = CommitScheduler(conn, GOLD_COMMIT_ROWS, GOLD_COMMIT_SECONDS, WAL_SIZE_LIMIT_MB * 1024 * 1024)
+        invoice_ids, payment_ids = load_rows_into_gold(cursor, silver_invoices, silver_payments, DEPARTMENT_MAPPINGS_PATH, scheduler)
+        scheduler.commit()
+        return invoice_ids, payment_ids
+
+    except Exception as e:
+        # Nothing from this shard gets marked cleaned in silver, so the next run retries it (rows already committed are skipped).
+        print(f"Error: Database error in load_gold_shard ({shard_path}): {e}")
+        if conn:
+            conn.rollback()
+        return [], []
+    finally:
+        if conn:
+            conn.close()
+
+def move_silver_to_gold_sharded(conn: sqlite3.Connection, cursor: sqlite3.Cursor, DEPARTMENT_MAPPINGS_PATH: str, gold_shard_paths: list[str],
+                                GOLD_COMMIT_ROWS: int = 0, GOLD_COMMIT_SECONDS: float = 0.0, WAL_SIZE_LIMIT_MB: int = 0) -> None:
+    # Step 1: Select new silver rows. Payments carry their invoice's customer_id so they land in the same shard as the invoice.
+    # Payments whose invoice isn't in silver yet are left out (and uncleaned): a later run routes them once the invoice has arrived.
+    cursor.execute("SELECT * FROM silver_invoices WHERE is_cleaned = 0")
+    silver_invoices = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT p.*, i.customer_id
+        FROM silver_payments p
+        JOIN silver_invoices i ON p.invoice_id = i.invoice_id
+        WHERE p.is_cleaned = 0
+    """)
+    silver_payments = cursor.fetchall()
+
+    # Step 2: Route rows by customer_id hash.
+    shard_count = len(gold_shard_paths)
+    shard_invoices = [[] for _ in gold_shard_paths]
+    shard_payments = [[] for _ in gold_shard_paths]
+    for invoice in silver_invoices:
+        shard_invoices[shard_for_customer(invoice[1], shard_count)].append(invoice)
+    for payment in silver_payments:
+        shard_payments[shard_for_customer(payment[-1], shard_count)].append(payment[:-1])
+
+    # Step 3: One writer process per shard, in parallel. Each shard commits on its own.
+    invoice_ids, payment_ids = [], []
+    with ProcessPoolExecutor(max_workers=min(shard_count, os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(load_gold_shard, shard_path, shard_invoices[shard], shard_payments[shard], DEPARTMENT_MAPPINGS_PATH,
+                                   GOLD_COMMIT_ROWS, GOLD_COMMIT_SECONDS, WAL_SIZE_LIMIT_MB)
+                   for shard, shard_path in enumerate(gold_shard_paths)]
+        for future in futures:
+            shard_invoice_ids, shard_payment_ids = future.result()
+            invoice_ids.extend(shard_invoice_ids)
+            payment_ids.extend(shard_payment_ids)
+
+    # Step 4: Mark what the shards committed as cleaned in silver
+    mark_silver_as_cleaned(cursor, invoice_ids, payment_ids)
+    conn.commit()
+    print(f"Inserted {len(invoice_ids)} invoices and {len(payment_ids)} payments into Gold Layer across {shard_count} shards")
 
 
 ##### Main Function #####
-def move_silver_to_gold(conn: sqlite3.Connection, cursor: sqlite3.Cursor, DEPARTMENT_MAPPINGS_PATH: str) -> None:
+def move_silver_to_gold(conn: sqlite3.Connection, cursor: sqlite3.Cursor, DEPARTMENT_MAPPINGS_PATH: str, gold_shard_paths: Optional[list[str]] = None,
+                        GOLD_COMMIT_ROWS: int = 0, GOLD_COMMIT_SECONDS: float = 0.0, WAL_SIZE_LIMIT_MB: int = 0) -> None:
     try:
-        # Track counts
-        invoices_moved_to_gold = 0
-        payments_moved_to_gold = 0
+        # Sharded mode: gold tables live in separate shard DB files instead of the main DB.
+        if gold_shard_paths and len(gold_shard_paths) > 1:
+            move_silver_to_gold_sharded(conn, cursor, DEPARTMENT_MAPPINGS_PATH, gold_shard_paths, GOLD_COMMIT_ROWS, GOLD_COMMIT_SECONDS, WAL_SIZE_LIMIT_MB)
+            return
 
-        # Step 1: Select data from silver_invoices
+        # Step 1: Select data from silver
         cursor.execute("SELECT * FROM silver_invoices WHERE is_cleaned = 0")
         silver_invoices = cursor.fetchall()
-        invoice_ids = []
-
-        for invoice in silver_invoices:
-            # Grab invoice values
-            invoice_id, customer_id, first_name, last_name, customer_email, customer_address, invoice_type, invoice_date, due_date, amount_due, currency, status, is_cleaned = invoice
-
-            # Insert into customer
-            insert_into_gold_customers(cursor, customer_id, first_name, last_name, customer_email, customer_address)
-
-            # Figure out department
-            department_id = determine_gold_department_classification(cursor, invoice_type, DEPARTMENT_MAPPINGS_PATH)
 
-            # Insert into invoice: Setting amount_paid = 0 and balance = amount_due, will come back later and update accordingly.
-            insert_into_gold_invoices(cursor, invoice_id, customer_id, department_id, invoice_type, invoice_date, due_date,
-                                      amount_due, 0.0, amount_due, currency, status)
-
-            # Add to Batch. Update row counter.
-            invoice_ids.append(invoice_id)
-            invoices_moved_to_gold += 1
-
-        # Step 2: Select data from silver_payments
         cursor.execute("SELECT * FROM silver_payments WHERE is_cleaned = 0")
         silver_payments = cursor.fetchall()
-        payment_ids = []
-        for payment in silver_payments:
-            # Grab payment values
-            payment_id, invoice_id, due_date, payment_date, amount_due, amount_paid, is_cleaned = payment
-
-            # Insert or update the payment in gold layer
-            insert_into_gold_payments(cursor, payment_id, invoice_id, payment_date, amount_due, amount_paid)
-
-            # Add to Batch. Update row counter.
-            payment_ids.append(payment_id)
-            payments_moved_to_gold += 1
-
-        # Step 3: Batch Update is_cleaned to 1 for the new invoice and payments. Need to create placeholder list b/c needs to have dynamic '?'s.
-        if invoice_ids:
-            placeholders = ','.join(['?'] * len(invoice_ids))
-            cursor.execute(f"""
-                UPDATE bronze_invoices 
-                SET is_cleaned = 1 
-                WHERE invoice_id IN ({placeholders}) 
-                    AND is_cleaned = 0
-            """, invoice_ids)
-
-        if payment_ids:
-            placeholders = ','.join(['?'] * len(payment_ids))
-            cursor.execute(f"""
-                UPDATE silver_payments 
-                SET is_cleaned = 1 
-                WHERE payment_id IN ({placeholders}) 
-                    AND is_cleaned = 0
-            """, payment_ids)
 
+        # Step 2: Insert into gold (customers, departments, invoices, payments, aging), committing at the scheduler's intervals.
+        scheduler = CommitScheduler(conn, GOLD_COMMIT_ROWS, GOLD_COMMIT_SECONDS, WAL_SIZE_LIMIT_MB * 1024 * 1024)
+        invoice_ids, payment_ids = load_rows_into_gold(cursor, silver_invoices, silver_payments, DEPARTMENT_MAPPINGS_PATH, scheduler, mark_cleaned=True)
+
+        # Step 3: Mark as cleaned in silver
+        mark_silver_as_cleaned(cursor, invoice_ids, payment_ids)
 
         # Step 4: Commit transaction to the database
-        conn.commit()
-        print(f"Inserted {invoices_moved_to_gold} invoices and {payments_moved_to_gold} payments into Gold Layer")
+        scheduler.commit()
+        print(f"Inserted {len(invoice_ids)} invoices and {len(payment_ids)} payments into Gold Layer ({scheduler.summary()})")
 
     except Exception as e:
         print(f"Error: Database error in move_silver_to_gold: {e}")
-        conn.rollback()
\ No newline at end of file
+        conn.rollback()
@@ -5,13 +5,14 @@ import pandas as pd
 from faker import Faker
 from datetime import datetime, timedelta
 
-fake = Faker(locale='en_US')                                                     # Library to generate fake data
-timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")                         # for file outputting --> invoice_2025_04_25_01_01_01.csv
-
 
 def invoices_payments_data_gen(chaos_threshold: str, invoice_count: str, payment_count: str) -> None:
     print("Data Gen started: please wait 20 seconds")
 
+    # Built per run instead of at import time: constructing Faker is slow and the timestamp has to be the run's, not the import's.
+    fake = Faker(locale='en_US')                                                 # Library to generate fake data
+    timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")                     # for file outputting --> invoice_2025_04_25_01_01_01.csv
+
     ## Invoices Gen
     # Step 1: Generate invoices
     invoices = []
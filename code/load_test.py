@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Optional
+
+# Endpoints hit by every client, round robin. "{invoice_id}" is filled with a random existing invoice per request.
+LOAD_TEST_ENDPOINTS = [
+    "/customers/top?limit=5",
+    "/payments/status",
+    "/departments/revenue",
+    "/payments/average",
+    "/payments/daily",
+    "/invoices/{invoice_id}",
+]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    # Nearest-rank percentile on an already sorted list.
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+def sample_invoice_ids(gold_paths: list[str], count: int) -> list[str]:
+    # Real invoice ids for the per-invoice lookups, spread over every gold DB.
+    invoice_ids = []
+    for gold_path in gold_paths:
+        conn = sqlite3.connect(f"file:{gold_path}?mode=ro", uri=True)
+        try:
+            invoice_ids.extend(row[0] for row in conn.execute("SELECT invoice_id FROM invoices ORDER BY RANDOM() LIMIT ?", (count,)))
+        finally:
+            conn.close()
+    return invoice_ids or ["INV-missing"]
+
+def run_client(base_url: str, invoice_ids: list[str], stop_at: float, results: list[tuple[str, float, bool]]) -> None:
+    # One client: keep requesting until the deadline. Latencies are appended to the shared results list (list.append is thread safe).
+    request_number = random.randrange(len(LOAD_TEST_ENDPOINTS))
+    while time.perf_counter() < stop_at:
+        endpoint = LOAD_TEST_ENDPOINTS[request_number % len(LOAD_TEST_ENDPOINTS)]
+        request_number += 1
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + endpoint.format(invoice_id=random.choice(invoice_ids)), timeout=30) as response:
+                response.read()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        results.append((endpoint.split("?")[0], (time.perf_counter() - start) * 1000, ok))
+
+def run_pipeline_writes(main_path: str, stop_event: threading.Event, invoice_count: int) -> int:
+    # Keep the pipeline writing (generate -> bronze -> silver -> gold) for the whole test. Smaller batches than the
+    #      default, so several gold loads (and gold version bumps) land during the run.
+    env = dict(os.environ, INVOICE_COUNT=str(invoice_count), PAYMENT_COUNT=str(max(1, invoice_count // 4)))
+    runs = 0
+    while not stop_event.is_set():
+        subprocess.run([sys.executable, main_path], env=env, cwd=os.path.dirname(main_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        runs += 1
+    return runs
+
+
+##### Main Function #####
+def run_load_test(base_url: str, gold_paths: list[str], clients: int, duration: float, main_path: Optional[str] = None,
+                  write_invoice_count: int = 2000) -> None:
+    invoice_ids = sample_invoice_ids(gold_paths, 200)
+
+    # Optional concurrent writer
+    stop_event = threading.Event()
+    writer_runs = []
+    writer = None
+    if main_path:
+        writer = threading.Thread(target=lambda: writer_runs.append(run_pipeline_writes(main_path, stop_event, write_invoice_count)))
+        writer.start()
+
+    # Clients
+    results = []
+    stop_at = time.perf_counter() + duration
+    threads = [threading.Thread(target=run_client, args=(base_url, invoice_ids, stop_at, results)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if writer:
+        print("Waiting for the last pipeline run to finish...")
+        stop_event.set()
+        writer.join()
+
+    # Report
+    print(f"Load test: {clients} clients for {duration:.0f}s against {base_url}" + (f", pipeline writing concurrently ({writer_runs[0]} runs)" if writer else ""))
+    print(f"{'endpoint':<22}{'requests':>10}{'errors':>8}{'p50_ms':>10}{'p99_ms':>10}")
+    endpoints = sorted(set(endpoint for endpoint, latency, ok in results))
+    for endpoint in endpoints + ["all"]:
+        latencies = sorted(latency for name, latency, ok in results if ok and endpoint in (name, "all"))
+        errors = sum(1 for name, latency, ok in results if not ok and endpoint in (name, "all"))
+        print(f"{endpoint:<22}{len(latencies):>10}{errors:>8}{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}")
+    print(f"Throughput: {len(results) / duration:.0f} requests/s")
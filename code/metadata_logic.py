@@ -0,0 +1,37 @@
+import sqlite3
+from typing import Optional
+
+
+def get_metadata(cursor: sqlite3.Cursor, meta_key: str, default: Optional[str] = None) -> Optional[str]:
+    # Databases created before pipeline_metadata existed simply fall back to the default.
+    try:
+        cursor.execute("SELECT meta_value FROM pipeline_metadata WHERE meta_key = ?", (meta_key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+    except sqlite3.OperationalError:
+        return default
+
+def set_metadata(cursor: sqlite3.Cursor, meta_key: str, meta_value: str) -> None:
+    # Upsert so callers don't need to know whether the key was seeded already.
+    cursor.execute("""
+        INSERT INTO pipeline_metadata (meta_key, meta_value)
+        VALUES (?, ?)
+        ON CONFLICT(meta_key) DO UPDATE SET meta_value = excluded.meta_value
+    """, (meta_key, meta_value))
+
+
+def get_database_id(cursor: sqlite3.Cursor) -> str:
+    # Random id seeded when the schema is created. Empty for a database the migrations haven't run on yet.
+    return get_metadata(cursor, "database_id", "")
+
+
+##### Gold Version Stamp #####
+def get_gold_version(cursor: sqlite3.Cursor) -> int:
+    # Version of the gold layer. Used by caches to know when their results went stale.
+    return int(get_metadata(cursor, "gold_version", "0"))
+
+def bump_gold_version(cursor: sqlite3.Cursor) -> int:
+    # Called by the gold loader inside its transaction, so the stamp only moves when new data is committed.
+    gold_version = get_gold_version(cursor) + 1
+    set_metadata(cursor, "gold_version", str(gold_version))
+    return gold_version
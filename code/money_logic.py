@@ -0,0 +1,56 @@
+import math
+import sqlite3
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Optional
+from code.metadata_logic import get_metadata, set_metadata
+
+# Money modes:
+#   "float" - amounts are stored as floating point dollars (original behaviour).
+#   "cents" - amounts are stored as integer minor units (cents) in silver and gold. Conversion only happens at the edges:
+#             bronze -> silver on the way in, and in the analysis queries on the way out.
+MONEY_MODES = ("float", "cents")
+MINOR_UNITS_PER_UNIT = 100
+
+
+def to_minor_units(value: Any) -> Optional[int]:
+    # Exact conversion of a dollar amount to cents. Goes through str() so 0.1 + 0.2 style float noise is rounded away.
+    # Returns None for missing or malformed values rather than guessing 0.
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+
+    try:
+        cents = (Decimal(str(value)) * MINOR_UNITS_PER_UNIT).quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+        return int(cents)
+    except (InvalidOperation, ValueError):
+        return None
+
+def from_minor_units(value: Optional[int]) -> Optional[float]:
+    return None if value is None else value / MINOR_UNITS_PER_UNIT
+
+def money_sql(expression: str, money_mode: str) -> str:
+    # Wrap a SQL money expression so it reads out in dollars whatever the storage mode.
+    if money_mode == "cents":
+        return f"(({expression}) / {MINOR_UNITS_PER_UNIT}.0)"
+    return expression
+
+
+##### Mode stored in the database #####
+def get_money_mode(cursor: sqlite3.Cursor) -> str:
+    # The database records the mode it was created with, so every layer agrees on how to read its amounts.
+    return get_metadata(cursor, "money_mode", "float")
+
+def initialize_money_mode(cursor: sqlite3.Cursor, MONEY_MODE: str) -> str:
+    # Only a fresh database picks up MONEY_MODE. Switching an existing one would mix units in the same columns.
+    if MONEY_MODE not in MONEY_MODES:
+        raise ValueError(f"Unknown money mode '{MONEY_MODE}'. Expected one of {MONEY_MODES}.")
+
+    stored_mode = get_metadata(cursor, "money_mode")
+    if stored_mode is None:
+        set_metadata(cursor, "money_mode", MONEY_MODE)
+        return MONEY_MODE
+
+    if stored_mode != MONEY_MODE:
+        print(f"Warning: Database was created with money mode '{stored_mode}', ignoring MONEY_MODE={MONEY_MODE}.")
+    return stored_mode
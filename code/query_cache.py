@@ -0,0 +1,129 @@
+import os
+import glob
+import pickle
+import hashlib
+import sqlite3
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Sequence
+
+
+class QueryCache:
+    """
+    Two level (memory + disk) cache for query results.
+
+    Results are keyed on the query text, its parameters and the gold version stamp, so a new gold load
+         invalidates every cached result without needing to track which tables a query touched.
+    namespace (e.g. the DB path) is part of every key, so databases sharing a cache folder never share entries.
+    The memory level is an LRU capped at max_memory_entries. The disk level lives in cache_folder as pickle files
+         named <version>_<hash>.pkl, capped at max_disk_entries (least recently used files are removed first).
+    Safe to share between threads (e.g. the query service's request threads): get, put and clear hold a lock.
+    """
+
+    def __init__(self, cache_folder: Optional[str], max_memory_entries: int = 64, max_disk_entries: int = 256, namespace: str = "") -> None:
+        self.cache_folder = cache_folder
+        self.namespace = namespace
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_folder:
+            os.makedirs(self.cache_folder, exist_ok=True)
+
+    def make_key(self, query: str, params: Sequence[Any], version: Any) -> str:
+        # Whitespace is normalized so re-indenting a query doesn't throw its cache away.
+        normalized_query = " ".join(query.split())
+        digest = hashlib.sha256(repr((self.namespace, normalized_query, tuple(params))).encode("utf-8")).hexdigest()
+        return f"{version}_{digest}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_folder, f"{key}.pkl")
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            # Step 1: Memory level
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+
+            # Step 2: Disk level. Promote into memory on hit and touch the file so disk eviction stays LRU.
+            if self.cache_folder and os.path.exists(self._disk_path(key)):
+                try:
+                    with open(self._disk_path(key), "rb") as f:
+                        value = pickle.load(f)
+                    os.utime(self._disk_path(key))
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+                except (OSError, pickle.UnpicklingError, EOFError) as e:
+                    print(f"Error: Couldn't read cached result {key}: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        with self.lock:
+            self._remember(key, value)
+
+            if self.cache_folder:
+                try:
+                    # Write to a temp file first so a crash mid-write never leaves a truncated entry behind.
+                    temp_path = self._disk_path(key) + ".tmp"
+                    with open(temp_path, "wb") as f:
+                        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(temp_path, self._disk_path(key))
+                    self._prune_disk(key.split("_")[0])
+                except OSError as e:
+                    print(f"Error: Couldn't write cached result {key}: {e}")
+
+    def _remember(self, key: str, value: Any) -> None:
+        # Caller holds the lock.
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _prune_disk(self, current_version: str) -> None:
+        # Entries from older gold versions can never be hit again, drop them straight away.
+        cached_files = glob.glob(os.path.join(self.cache_folder, "*.pkl"))
+        current_files = []
+        for path in cached_files:
+            if os.path.basename(path).split("_")[0] != current_version:
+                os.remove(path)
+            else:
+                current_files.append(path)
+
+        # Then keep the most recently used max_disk_entries.
+        current_files.sort(key=os.path.getmtime, reverse=True)
+        for path in current_files[self.max_disk_entries:]:
+            os.remove(path)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            if self.cache_folder:
+                for path in glob.glob(os.path.join(self.cache_folder, "*.pkl")):
+                    os.remove(path)
+
+    def get_or_compute(self, query: str, params: Sequence[Any], version: Any, compute: Callable[[], Any]) -> Any:
+        # Serve from the cache, or compute and store. compute() is only called on a miss.
+        key = self.make_key(query, params, version)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+
+        # Hand back a copy so callers mutating the DataFrame (e.g. date conversions) don't poison the cache.
+        return result.copy() if hasattr(result, "copy") else result
+
+
+def read_sql_cached(cache: Optional[QueryCache], conn: sqlite3.Connection, query: str, params: Sequence[Any] = (), version: Any = 0) -> pd.DataFrame:
+    # Same as pd.read_sql_query, but served from the cache when the gold layer hasn't changed.
+    if cache is None:
+        return pd.read_sql_query(query, conn, params=tuple(params))
+    return cache.get_or_compute(query, params, version, lambda: pd.read_sql_query(query, conn, params=tuple(params)))
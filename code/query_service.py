@@ -0,0 +1,149 @@
+import json
+import queue
+import sqlite3
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import urlparse, parse_qs, unquote
+from code.analysis_logic import (top_customers_by_payments, invoice_payment_status, revenue_by_department, average_payment,
+                                 daily_payment_totals, invoice_balance)
+from code.money_logic import get_money_mode
+from code.query_cache import QueryCache
+from code.shard_logic import get_combined_gold_version
+
+# Upper bound for /customers/top?limit=, so a single request can't ask every shard for its whole customer table.
+MAX_TOP_LIMIT = 1000
+
+
+class ReadOnlyPool:
+    """
+    Fixed size pool of read-only connections to the gold DB(s).
+
+    Each pool slot is a list of connections, one per gold DB (a single one unless gold is sharded), so a request leases
+         everything it needs to fan out in one go. Connections are opened with mode=ro and query_only, which lets them
+         read the WAL-mode database while the pipeline is writing. The queries are parameterized, so sqlite3's per-connection
+         statement cache keeps them prepared across requests.
+    """
+
+    def __init__(self, gold_paths: list[str], size: int) -> None:
+        self.slots = queue.Queue()
+        for _ in range(size):
+            self.slots.put([self._connect(gold_path) for gold_path in gold_paths])
+
+    @staticmethod
+    def _connect(gold_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{gold_path}?mode=ro", uri=True, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def lease(self) -> Iterator[list[sqlite3.Connection]]:
+        connections = self.slots.get()
+        try:
+            yield connections
+        finally:
+            self.slots.put(connections)
+
+    def close(self) -> None:
+        while not self.slots.empty():
+            for conn in self.slots.get_nowait():
+                conn.close()
+
+
+class QueryService:
+    """
+    The reconciliation questions from analysis.py as JSON endpoints.
+
+    Responses are cached in memory, keyed on the request and the combined gold version, so repeated requests are served
+         without touching SQLite until the gold loader bumps the version.
+    """
+
+    def __init__(self, gold_paths: list[str], pool_size: int = 4, cache_entries: int = 256) -> None:
+        self.pool = ReadOnlyPool(gold_paths, pool_size)
+        self.cache = QueryCache(None, max_memory_entries=cache_entries, namespace="|".join(gold_paths))
+
+        # Money mode is fixed for the life of the database, so it's only read once.
+        with self.pool.lease() as connections:
+            self.money_mode = get_money_mode(connections[0].cursor())
+
+    def handle(self, path: str, query_string: str) -> tuple[int, bytes]:
+        # Route a GET request. Returns (status, JSON body).
+        params = {key: values[-1] for key, values in parse_qs(query_string).items()}
+
+        with self.pool.lease() as connections:
+            version = get_combined_gold_version(connections)
+
+            def compute() -> bytes:
+                result = self.run_query(connections, path, params)
+                if result is None:
+                    return b""
+                return result.to_json(orient="records", date_format="iso").encode("utf-8")
+
+            body = self.cache.get_or_compute(path, sorted(params.items()), version, compute)
+
+        if not body:
+            return 404, json.dumps({"error": f"Not found: {path}"}).encode("utf-8")
+        return 200, body
+
+    def run_query(self, connections: list[sqlite3.Connection], path: str, params: dict[str, str]):
+        money_mode = self.money_mode
+
+        if path == "/customers/top":
+            limit = int(params.get("limit", 5))
+            if not 1 <= limit <= MAX_TOP_LIMIT:
+                raise ValueError(f"limit must be between 1 and {MAX_TOP_LIMIT}")
+            return top_customers_by_payments(connections, money_mode, limit)
+        elif path == "/payments/status":
+            return invoice_payment_status(connections, money_mode)
+        elif path == "/departments/revenue":
+            return revenue_by_department(connections, money_mode)
+        elif path == "/payments/average":
+            return average_payment(connections, money_mode)
+        elif path == "/payments/daily":
+            return daily_payment_totals(connections, money_mode)
+        elif path.startswith("/invoices/"):
+            result = invoice_balance(connections, money_mode, unquote(path[len("/invoices/"):]))
+            return result if not result.empty else None
+        elif path == "/health":
+            import pandas as pd
+            return pd.DataFrame({"status": ["ok"], "gold_dbs": [len(connections)]})
+        return None
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def make_handler(service: QueryService) -> type:
+    class QueryRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            try:
+                status, body = service.handle(url.path.rstrip("/") or "/", url.query)
+            except ValueError as e:
+                status, body = 400, json.dumps({"error": str(e)}).encode("utf-8")
+            except Exception as e:
+                print(f"Error: Query service failed on {self.path}: {e}")
+                status, body = 500, json.dumps({"error": "Internal error"}).encode("utf-8")
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # Per-request access logs would swamp the output under load.
+            pass
+
+    return QueryRequestHandler
+
+
+##### Main Function #####
+def start_query_service(gold_paths: list[str], host: str, port: int, pool_size: int = 4,
+                        cache_entries: int = 256) -> tuple[ThreadingHTTPServer, QueryService]:
+    # Build the service and its HTTP server. The caller runs server.serve_forever() (in a thread, for the load test).
+    service = QueryService(gold_paths, pool_size, cache_entries)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Query service listening on http://{host}:{server.server_address[1]} ({len(gold_paths)} gold DBs, {pool_size} pooled connections each)")
+    return server, service
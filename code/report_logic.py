@@ -0,0 +1,153 @@
+import os
+import time
+import sqlite3
+import numpy as np
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+from code.aging_logic import receivables_aging_report
+from code.analysis_logic import (invoice_payment_status, revenue_by_department, payment_date_range, payment_totals_by_bucket)
+from code.query_cache import QueryCache
+
+# Trend bucket sizes, smallest first, with their approximate length in days. The smallest one that fits the date range
+#      in max_points buckets is used, so years of history are summed into weeks or months by SQLite instead of shipped per day.
+TREND_BUCKETS = [("day", 1), ("week", 7), ("month", 30)]
+
+
+def choose_trend_bucket(start: date, end: date, max_points: int) -> str:
+    span_days = (end - start).days + 1
+    for bucket, bucket_days in TREND_BUCKETS:
+        if span_days / bucket_days <= max_points:
+            return bucket
+    return TREND_BUCKETS[-1][0]
+
+def downsample_lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: keeps the first and last points, then from each of threshold - 2 equal buckets the
+    #      point forming the largest triangle with the previously kept point and the next bucket's average. Peaks and
+    #      dips survive, unlike with plain every-Nth sampling. Returns the indices to keep.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        bucket_start, bucket_end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = bucket_end, min(int((i + 2) * every) + 1, n)
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        areas = np.abs((x[previous] - next_x) * (y[bucket_start:bucket_end] - y[previous])
+                       - (x[previous] - x[bucket_start:bucket_end]) * (next_y - y[previous]))
+        previous = bucket_start + int(areas.argmax())
+        indices[i + 1] = previous
+    return indices
+
+
+##### Chart specs: plain data, built in the main process from aggregated queries #####
+def payment_trend_chart(connections: list[sqlite3.Connection], money_mode: str, start: Optional[str], end: Optional[str],
+                        max_points: int, path: str, cache: Optional[QueryCache] = None, version: Any = 0) -> Optional[dict]:
+    # Missing ends of the range default to the first/last payment. None when there are no dated payments.
+    if start is None or end is None:
+        date_range = payment_date_range(connections, cache, version)
+        start = start or date_range["first_date"].iloc[0]
+        end = end or date_range["last_date"].iloc[0]
+        if not isinstance(start, str) or not isinstance(end, str):
+            return None
+
+    bucket = choose_trend_bucket(date.fromisoformat(start), date.fromisoformat(end), max_points)
+    series = payment_totals_by_bucket(connections, money_mode, bucket, start, end, cache, version)
+
+    # Aggregation bounds the series by the date range; downsampling bounds it when even monthly buckets are too many.
+    x = series["bucket_start"].to_numpy(dtype="datetime64[ns]")
+    y = series["total_paid"].to_numpy(dtype=float)
+    keep = downsample_lttb(x.astype("int64").astype(float), y, max_points)
+    title = f"Payment Totals per {bucket.capitalize()} ({start} to {end})"
+    if len(keep) < len(series):
+        title += f", {len(keep)} of {len(series)} points"
+
+    return {"kind": "line", "title": title, "xlabel": bucket.capitalize(), "ylabel": "Total Payments",
+            "x": x[keep], "y": y[keep], "path": path}
+
+def payment_status_chart(connections: list[sqlite3.Connection], money_mode: str, path: str,
+                         cache: Optional[QueryCache] = None, version: Any = 0) -> dict:
+    result = invoice_payment_status(connections, money_mode, cache, version)
+    return {"kind": "bar", "title": "Invoices by Payment Status", "xlabel": "Status", "ylabel": "Invoices",
+            "x": result["invoice_payment_status"].tolist(), "y": result["count"].tolist(), "path": path}
+
+def department_revenue_chart(connections: list[sqlite3.Connection], money_mode: str, path: str,
+                             cache: Optional[QueryCache] = None, version: Any = 0) -> dict:
+    result = revenue_by_department(connections, money_mode, cache, version)
+    return {"kind": "barh", "title": "Total Revenue by Department", "xlabel": "Total Revenue", "ylabel": "Department",
+            "x": result["department_name"].tolist(), "y": result["total_revenue"].tolist(), "path": path}
+
+def receivables_aging_chart(connections: list[sqlite3.Connection], path: str) -> dict:
+    # Per-bucket running totals from every gold DB, added up (one row per bucket and DB, no scan of invoices).
+    report = {}
+    for conn in connections:
+        for bucket, invoice_count, outstanding_balance in receivables_aging_report(conn.cursor()):
+            report[bucket] = report.get(bucket, 0) + (outstanding_balance or 0)
+    return {"kind": "bar", "title": "Receivables Aging", "xlabel": "Days Past Due", "ylabel": "Outstanding Balance",
+            "x": list(report.keys()), "y": list(report.values()), "path": path}
+
+
+##### Rendering #####
+def draw_chart(ax: Any, chart: dict) -> None:
+    # Lines are drawn without markers: with hundreds of points they only add render time and clutter.
+    if chart["kind"] == "line":
+        ax.plot(chart["x"], chart["y"], linewidth=1)
+        ax.tick_params(axis="x", labelrotation=45)
+    elif chart["kind"] == "bar":
+        ax.bar(chart["x"], chart["y"])
+    elif chart["kind"] == "barh":
+        ax.barh(chart["x"], chart["y"])
+        ax.invert_yaxis()
+    ax.set_title(chart["title"])
+    ax.set_xlabel(chart["xlabel"])
+    ax.set_ylabel(chart["ylabel"])
+    ax.grid(True)
+
+def render_chart(chart: dict) -> str:
+    # Figure is used directly rather than pyplot: it renders with Agg, needs no display and keeps no global figure state.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    draw_chart(fig.subplots(), chart)
+    fig.tight_layout()
+    fig.savefig(chart["path"], dpi=100)
+    return chart["path"]
+
+def render_charts(charts: list[dict], workers: int) -> list[str]:
+    # One process per chart (up to workers): matplotlib rendering is CPU bound and holds the GIL.
+    # matplotlib is imported before the pool starts, so forked workers inherit it instead of each paying the import.
+    import matplotlib.figure
+    workers = min(workers, len(charts), os.cpu_count() or 1)
+    if workers <= 1:
+        return [render_chart(chart) for chart in charts]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_chart, charts))
+
+
+##### Main Function #####
+def generate_report(connections: list[sqlite3.Connection], money_mode: str, REPORTS_FOLDER: str, start: Optional[str] = None,
+                    end: Optional[str] = None, max_points: int = 500, workers: int = 4,
+                    cache: Optional[QueryCache] = None, version: Any = 0) -> list[str]:
+    # Render the report charts as PNGs into REPORTS_FOLDER. Returns their paths.
+    os.makedirs(REPORTS_FOLDER, exist_ok=True)
+    started = time.perf_counter()
+
+    # Step 1: Aggregate in SQLite (every shard), so each chart gets at most max_points points however long the history is.
+    charts = [
+        payment_trend_chart(connections, money_mode, start, end, max_points, os.path.join(REPORTS_FOLDER, "payment_trend.png"), cache, version),
+        payment_status_chart(connections, money_mode, os.path.join(REPORTS_FOLDER, "payment_status.png"), cache, version),
+        department_revenue_chart(connections, money_mode, os.path.join(REPORTS_FOLDER, "department_revenue.png"), cache, version),
+        receivables_aging_chart(connections, os.path.join(REPORTS_FOLDER, "receivables_aging.png")),
+    ]
+    charts = [chart for chart in charts if chart is not None]
+    queried = time.perf_counter()
+
+    # Step 2: Render in parallel.
+    paths = render_charts(charts, workers)
+    print(f"Rendered {len(paths)} charts to {REPORTS_FOLDER} (queries {queried - started:.2f}s, rendering {time.perf_counter() - queried:.2f}s).")
+    return paths
@@ -0,0 +1,98 @@
+import os
+import csv
+import gzip
+import shutil
+import sqlite3
+from datetime import datetime
+
+# Bronze tables and the view/table to archive them from. Compact rows are archived decoded, so archives are self-contained.
+BRONZE_RETENTION_TABLES = [
+    ("bronze_invoices", "bronze_invoices"),
+    ("bronze_payments", "bronze_payments"),
+    ("bronze_invoices_compact", "bronze_invoices_decoded"),
+    ("bronze_payments_compact", "bronze_payments_decoded"),
+]
+
+
+def compress_processed_files(PROCESSED_FOLDER: str) -> int:
+    # Gzip every processed CSV in place (file.csv -> file.csv.gz). Already compressed files are left alone.
+    compressed = 0
+    for filename in os.listdir(PROCESSED_FOLDER):
+        if not filename.endswith(".csv"):
+            continue
+
+        full_path = os.path.join(PROCESSED_FOLDER, filename)
+        try:
+            with open(full_path, "rb") as source, gzip.open(full_path + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(full_path)
+            compressed += 1
+        except OSError as e:
+            print(f"Error: Couldn't compress {filename}: {e}")
+
+    print(f"Compressed {compressed} processed files.")
+    return compressed
+
+def archive_rows(cursor: sqlite3.Cursor, source_name: str, archive_path: str) -> int:
+    # Stream promoted rows into a gzipped CSV without pulling the whole table into memory.
+    cursor.execute(f"SELECT * FROM {source_name} WHERE is_cleaned = 1")
+    header = [column[0] for column in cursor.description]
+
+    archived = 0
+    with gzip.open(archive_path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            writer.writerows(rows)
+            archived += len(rows)
+
+    # Nothing promoted since the last run, so don't leave an empty archive behind.
+    if archived == 0:
+        os.remove(archive_path)
+    return archived
+
+
+##### Main Functions #####
+def prune_promoted_bronze_rows(conn: sqlite3.Connection, cursor: sqlite3.Cursor, ARCHIVE_FOLDER: str, retention_mode: str = "archive",
+                               vacuum: bool = False) -> None:
+    # Bronze rows with is_cleaned = 1 have already been promoted to silver. Silver's own duplicate checks
+    #      don't depend on them, so they can be archived (retention_mode = "archive") or simply dropped ("prune").
+    try:
+        if retention_mode not in ("archive", "prune"):
+            raise ValueError(f"Unknown retention mode '{retention_mode}'. Expected 'archive' or 'prune'.")
+
+        if retention_mode == "archive":
+            os.makedirs(ARCHIVE_FOLDER, exist_ok=True)
+
+        # Hold the write lock for the whole run, so no row can be promoted between being archived and being deleted.
+        cursor.execute("BEGIN IMMEDIATE")
+
+        run_timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+        for table_name, source_name in BRONZE_RETENTION_TABLES:
+            if retention_mode == "archive":
+                archive_path = os.path.join(ARCHIVE_FOLDER, f"{table_name}_{run_timestamp}.csv.gz")
+                archived = archive_rows(cursor, source_name, archive_path)
+                print(f"Archived {archived} rows from {table_name}.")
+
+            cursor.execute(f"DELETE FROM {table_name} WHERE is_cleaned = 1")
+            print(f"Removed {cursor.rowcount} promoted rows from {table_name}.")
+
+        # Load batches no longer referenced by any compact row.
+        cursor.execute("""
+            DELETE FROM bronze_load_batches
+            WHERE batch_id NOT IN (SELECT batch_id FROM bronze_invoices_compact WHERE batch_id IS NOT NULL)
+                AND batch_id NOT IN (SELECT batch_id FROM bronze_payments_compact WHERE batch_id IS NOT NULL)
+        """)
+        conn.commit()
+
+        # Deleted pages are reused by later loads either way. VACUUM actually hands the space back to the filesystem.
+        if vacuum:
+            conn.execute("VACUUM")
+            print("Database vacuumed.")
+
+    except Exception as e:
+        print(f"Error: Database error in prune_promoted_bronze_rows: {e}")
+        conn.rollback()
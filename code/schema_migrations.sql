@@ -0,0 +1,139 @@
+-- Schema Migrations: tables added after the original Bronze, Silver and Gold setup (table_setup.sql)
+-- Runs on every start, after table_setup.sql. Every statement is IF NOT EXISTS / OR IGNORE, so a fresh database gets
+-- the full schema, an existing one gets only what it's missing, and no existing data is touched.
+
+--------------------------------
+-- BRONZE LAYER (COMPACT STORAGE): Used when BRONZE_STORAGE_MODE=compact
+-- Low-cardinality columns (invoice_type, currency, status) are stored as integer ids into bronze_lookup_values,
+-- and the repeated load_timestamp string is replaced by a reference to the load batch.
+CREATE TABLE IF NOT EXISTS bronze_load_batches (
+    batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_file TEXT,
+    load_timestamp TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bronze_lookup_values (
+    lookup_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    column_name TEXT,
+    lookup_value TEXT,
+    UNIQUE (column_name, lookup_value)
+);
+
+CREATE TABLE IF NOT EXISTS bronze_invoices_compact (
+    invoice_id TEXT,
+    customer_id TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    customer_email TEXT,
+    customer_address TEXT,
+    invoice_type_id INTEGER,
+    invoice_date TEXT,
+    due_date TEXT,
+    amount_due REAL,
+    currency_id INTEGER,
+    status_id INTEGER,
+    batch_id INTEGER,
+    is_cleaned INTEGER DEFAULT 0,
+    FOREIGN KEY (invoice_type_id) REFERENCES bronze_lookup_values(lookup_id),
+    FOREIGN KEY (currency_id) REFERENCES bronze_lookup_values(lookup_id),
+    FOREIGN KEY (status_id) REFERENCES bronze_lookup_values(lookup_id),
+    FOREIGN KEY (batch_id) REFERENCES bronze_load_batches(batch_id)
+);
+
+CREATE TABLE IF NOT EXISTS bronze_payments_compact (
+    payment_id TEXT,
+    invoice_id TEXT,
+    due_date TEXT,
+    payment_date TEXT,
+    amount_due REAL,
+    amount_paid REAL,
+    batch_id INTEGER,
+    is_cleaned INTEGER DEFAULT 0,
+    FOREIGN KEY (batch_id) REFERENCES bronze_load_batches(batch_id)
+);
+
+-- Decoded views expose the compact tables with the exact column layout of bronze_invoices/bronze_payments.
+CREATE VIEW IF NOT EXISTS bronze_invoices_decoded AS
+SELECT
+    i.invoice_id, i.customer_id, i.first_name, i.last_name, i.customer_email, i.customer_address,
+    t.lookup_value AS invoice_type, i.invoice_date, i.due_date, i.amount_due,
+    c.lookup_value AS currency, s.lookup_value AS status, b.load_timestamp, i.is_cleaned
+FROM bronze_invoices_compact i
+LEFT JOIN bronze_lookup_values t ON i.invoice_type_id = t.lookup_id
+LEFT JOIN bronze_lookup_values c ON i.currency_id = c.lookup_id
+LEFT JOIN bronze_lookup_values s ON i.status_id = s.lookup_id
+LEFT JOIN bronze_load_batches b ON i.batch_id = b.batch_id;
+
+CREATE VIEW IF NOT EXISTS bronze_payments_decoded AS
+SELECT
+    p.payment_id, p.invoice_id, p.due_date, p.payment_date, p.amount_due, p.amount_paid,
+    b.load_timestamp, p.is_cleaned
+FROM bronze_payments_compact p
+LEFT JOIN bronze_load_batches b ON p.batch_id = b.batch_id;
+
+--------------------------------
+-- BRONZE LAYER (DUPLICATE DETECTION): Maintained by code/dedup_logic.py
+-- One 16-byte hash per distinct row ever ingested (either storage mode). Confirms the Bloom filter's "maybe seen" answers.
+-- Kept when retention prunes bronze rows, so a resent row is still recognized.
+-- Starts empty on an existing database: rows ingested before it existed aren't indexed.
+CREATE TABLE IF NOT EXISTS bronze_row_hashes (
+    row_hash BLOB PRIMARY KEY
+) WITHOUT ROWID;
+
+--------------------------------
+-- PIPELINE METADATA: Version stamps and settings shared across layers
+CREATE TABLE IF NOT EXISTS pipeline_metadata (
+    meta_key TEXT PRIMARY KEY,
+    meta_value TEXT
+);
+
+-- Gold version is bumped by the gold loader whenever new data lands. Query caches key on it.
+-- database_id is random per database (re-created whenever table_setup.sql runs), so caches never confuse a new
+-- database, whose gold version starts again from 0, with an old one.
+INSERT OR IGNORE INTO pipeline_metadata (meta_key, meta_value)
+VALUES ('gold_version', '0'), ('database_id', lower(hex(randomblob(16))));
+
+--------------------------------
+-- RECEIVABLES AGING: Maintained incrementally by code/aging_logic.py
+-- One row per open invoice (balance > 0, not Canceled). due_on is the ISO (sortable) copy of invoices.due_date,
+-- so the daily refresh can range-scan only the invoices whose due date crossed a bucket boundary.
+-- Starts empty on an existing database: the first aging refresh (no aging_as_of yet) rebuilds it from invoices.
+CREATE TABLE IF NOT EXISTS invoice_aging (
+    invoice_id TEXT PRIMARY KEY,
+    due_on TEXT,
+    balance NUMERIC,
+    aging_bucket TEXT,
+    FOREIGN KEY (invoice_id) REFERENCES invoices(invoice_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_invoice_aging_due_on ON invoice_aging(due_on);
+
+-- Running totals per bucket, kept in sync by the triggers below. The aging report reads one row per bucket.
+CREATE TABLE IF NOT EXISTS aging_buckets (
+    aging_bucket TEXT PRIMARY KEY,
+    invoice_count INTEGER DEFAULT 0,
+    outstanding_balance NUMERIC DEFAULT 0
+);
+
+INSERT OR IGNORE INTO aging_buckets (aging_bucket)
+VALUES ('current'), ('0-30'), ('31-60'), ('61-90'), ('90+');
+
+CREATE TRIGGER IF NOT EXISTS trg_invoice_aging_insert AFTER INSERT ON invoice_aging
+BEGIN
+    UPDATE aging_buckets SET invoice_count = invoice_count + 1, outstanding_balance = outstanding_balance + NEW.balance
+    WHERE aging_bucket = NEW.aging_bucket;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoice_aging_update AFTER UPDATE OF balance, aging_bucket ON invoice_aging
+BEGIN
+    UPDATE aging_buckets SET invoice_count = invoice_count - 1, outstanding_balance = outstanding_balance - OLD.balance
+    WHERE aging_bucket = OLD.aging_bucket;
+    UPDATE aging_buckets SET invoice_count = invoice_count + 1, outstanding_balance = outstanding_balance + NEW.balance
+    WHERE aging_bucket = NEW.aging_bucket;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoice_aging_delete AFTER DELETE ON invoice_aging
+BEGIN
+    UPDATE aging_buckets SET invoice_count = invoice_count - 1, outstanding_balance = outstanding_balance - OLD.balance
+    WHERE aging_bucket = OLD.aging_bucket;
+END;
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import os
+import zlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+from code.bronze_logic import check_or_create_tables, apply_schema_migrations
+from code.metadata_logic import get_metadata, set_metadata, get_database_id, get_gold_version
+from code.money_logic import initialize_money_mode
+
+# pandas is only needed to fan out queries. The gold loader imports this module for routing alone.
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def shard_for_customer(customer_id: str, shard_count: int) -> int:
+    # Stable across processes and runs (unlike hash(), which is salted per interpreter).
+    return zlib.crc32(str(customer_id).encode("utf-8")) % shard_count
+
+def gold_shard_paths(DB_PATH: str, shard_count: int) -> list[str]:
+    # One shard keeps gold in the main DB file. Otherwise ./db/invoices_payments.db -> ./db/invoices_payments.shard0.db, ...
+    if shard_count <= 1:
+        return [DB_PATH]
+    root, extension = os.path.splitext(DB_PATH)
+    return [f"{root}.shard{shard}{extension}" for shard in range(shard_count)]
+
+
+##### Shard count stored in the main database #####
+def get_gold_shard_count(cursor: sqlite3.Cursor) -> int:
+    return int(get_metadata(cursor, "gold_shard_count", "1"))
+
+def initialize_gold_shard_count(cursor: sqlite3.Cursor, GOLD_SHARD_COUNT: int) -> int:
+    # Like the money mode, only a fresh database picks up GOLD_SHARD_COUNT. Changing it later would route customers
+    #      to a different shard than the one already holding their invoices.
+    stored_count = get_metadata(cursor, "gold_shard_count")
+    if stored_count is None:
+        set_metadata(cursor, "gold_shard_count", str(GOLD_SHARD_COUNT))
+        return GOLD_SHARD_COUNT
+
+    if int(stored_count) != GOLD_SHARD_COUNT:
+        print(f"Warning: Database was created with {stored_count} gold shards, ignoring GOLD_SHARD_COUNT={GOLD_SHARD_COUNT}.")
+    return int(stored_count)
+
+def get_gold_db_paths(cursor: sqlite3.Cursor, DB_PATH: str) -> list[str]:
+    # Paths of every DB file holding gold tables, according to the main DB.
+    return gold_shard_paths(DB_PATH, get_gold_shard_count(cursor))
+
+def initialize_gold_shards(shard_paths: list[str], TABLE_SETUP_PATH: str, SCHEMA_MIGRATIONS_PATH: str, expected_tables: list[str],
+                           money_mode: str) -> None:
+    # Each shard gets the full schema plus the main DB's money mode, so gold code runs unchanged against it.
+    for shard_path in shard_paths:
+        conn = sqlite3.connect(shard_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode = WAL;")
+            check_or_create_tables(conn, cursor, TABLE_SETUP_PATH, expected_tables)
+            apply_schema_migrations(conn, SCHEMA_MIGRATIONS_PATH)
+            initialize_money_mode(cursor, money_mode)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+##### Fan out reads #####
+def open_gold_connections(shard_paths: list[str]) -> list[sqlite3.Connection]:
+    # check_same_thread=False: fan_out hands each connection to a worker thread (one thread per connection at a time).
+    return [sqlite3.connect(shard_path, check_same_thread=False) for shard_path in shard_paths]
+
+def fan_out(connections: list[sqlite3.Connection], function: Callable[[sqlite3.Connection], Any]) -> list[Any]:
+    # Run function against every shard in parallel. sqlite3 releases the GIL while a query runs, so threads are enough.
+    if len(connections) == 1:
+        return [function(connections[0])]
+    with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+        return list(executor.map(function, connections))
+
+def get_combined_gold_version(connections: list[sqlite3.Connection]) -> str:
+    # Any shard receiving new data changes the combined version. Each part is prefixed with the start of the DB's id, which
+    #      changes whenever the schema is re-created, so a new DB whose gold version restarts from 0 never matches results
+    #      cached for the old one. Joined with "-" so it stays a safe cache key prefix.
+    # Sequential on purpose: it's a primary key lookup per shard, cheaper than handing it to threads.
+    return "-".join(f"{get_database_id(conn.cursor())[:8]}.{get_gold_version(conn.cursor())}" for conn in connections)
+
+def fan_out_query(connections: list[sqlite3.Connection], query: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+    # Partial results from every shard, stacked. Callers merge them (see merge_partial_aggregates).
+    import pandas as pd
+
+    frames = fan_out(connections, lambda conn: pd.read_sql_query(query, conn, params=tuple(params)))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def merge_partial_aggregates(partials: pd.DataFrame, group_by: list[str], sum_columns: list[str]) -> pd.DataFrame:
+    # SUM and COUNT partials merge by summing them again. Averages have to be rebuilt from merged sums and counts by the caller.
+    return partials.groupby(group_by, as_index=False, dropna=False)[sum_columns].sum()
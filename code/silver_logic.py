@@ -1,5 +1,6 @@
 import sqlite3
 from datetime import datetime
+from code.money_logic import get_money_mode, to_minor_units
 
 
 def is_valid_date(date_string: str, date_format: str = "%Y-%m-%d") -> bool:
@@ -18,12 +19,24 @@ def move_bronze_to_silver(conn: sqlite3.Connection, cursor: sqlite3.Cursor) -> N
         # Track counts
         invoices_moved_to_silver = 0
         payments_moved_to_silver = 0
+        rejected_amounts = 0
 
-        # Step 1: Extract records where is_cleaned is 0
-        cursor.execute("SELECT * FROM bronze_invoices WHERE is_cleaned = 0")
+        # Money mode the database was created with. In "cents" mode amounts are converted to integer cents here, on the way in.
+        money_mode = get_money_mode(cursor)
+
+        # Step 1: Extract records where is_cleaned is 0. The decoded views cover rows ingested with BRONZE_STORAGE_MODE=compact.
+        cursor.execute("""
+            SELECT * FROM bronze_invoices WHERE is_cleaned = 0
+            UNION ALL
+            SELECT * FROM bronze_invoices_decoded WHERE is_cleaned = 0
+        """)
         bronze_invoices = cursor.fetchall()
 
-        cursor.execute("SELECT * FROM bronze_payments WHERE is_cleaned = 0")
+        cursor.execute("""
+            SELECT * FROM bronze_payments WHERE is_cleaned = 0
+            UNION ALL
+            SELECT * FROM bronze_payments_decoded WHERE is_cleaned = 0
+        """)
         bronze_payments = cursor.fetchall()
 
         # Step 2: Process bronze_invoices and insert into silver_invoices
@@ -36,6 +49,13 @@ def move_bronze_to_silver(conn: sqlite3.Connection, cursor: sqlite3.Cursor) -> N
             if amount_due is None or amount_due == 0:
                 continue
 
+            # Exact money mode: reject (rather than zero out) anything that isn't a valid amount.
+            if money_mode == "cents":
+                amount_due = to_minor_units(amount_due)
+                if amount_due is None:
+                    rejected_amounts += 1
+                    continue
+
             # Handle invoice_date and due_date
             if invoice_date and is_valid_date(invoice_date):
                 # Parse the date string into a datetime object
@@ -80,6 +100,15 @@ def move_bronze_to_silver(conn: sqlite3.Connection, cursor: sqlite3.Cursor) -> N
             if amount_paid is None or amount_paid == 0:
                 continue
 
+            # Exact money mode: reject (rather than zero out) anything that isn't a valid amount. Gold computes the invoice
+            #      balance from amount_due, so a payment without a valid one can't be loaded either.
+            if money_mode == "cents":
+                amount_paid = to_minor_units(amount_paid)
+                amount_due = to_minor_units(amount_due)
+                if amount_paid is None or amount_due is None:
+                    rejected_amounts += 1
+                    continue
+
             # Handle due_date and payment_date
             if due_date and is_valid_date(due_date):
                 # Parse the date string into a datetime object
@@ -113,25 +142,29 @@ def move_bronze_to_silver(conn: sqlite3.Connection, cursor: sqlite3.Cursor) -> N
         # Step 4: Batch Update is_cleaned to 1 for the new invoice and payments. Need to create placeholder list b/c needs to have dynamic '?'s.
         if invoice_ids:
             placeholders = ','.join(['?'] * len(invoice_ids))
-            cursor.execute(f"""
-                UPDATE bronze_invoices 
-                SET is_cleaned = 1 
-                WHERE invoice_id IN ({placeholders}) 
-                    AND is_cleaned = 0
-            """, invoice_ids)
+            for table_name in ["bronze_invoices", "bronze_invoices_compact"]:
+                cursor.execute(f"""
+                    UPDATE {table_name} 
+                    SET is_cleaned = 1 
+                    WHERE invoice_id IN ({placeholders}) 
+                        AND is_cleaned = 0
+                """, invoice_ids)
 
         if payment_ids:
             placeholders = ','.join(['?'] * len(payment_ids))
-            cursor.execute(f"""
-                UPDATE bronze_payments 
-                SET is_cleaned = 1 
-                WHERE payment_id IN ({placeholders}) 
-                    AND is_cleaned = 0
-            """, payment_ids)
+            for table_name in ["bronze_payments", "bronze_payments_compact"]:
+                cursor.execute(f"""
+                    UPDATE {table_name} 
+                    SET is_cleaned = 1 
+                    WHERE payment_id IN ({placeholders}) 
+                        AND is_cleaned = 0
+                """, payment_ids)
 
         # Step 5: Commit the changes to the database
         conn.commit()
         print(f"Inserted {invoices_moved_to_silver} invoices and {payments_moved_to_silver} payments into Silver Layer")
+        if rejected_amounts:
+            print(f"Rejected {rejected_amounts} records with invalid amounts.")
 
     except Exception as e:
         print(f"Error: Database error in move_bronze_to_silver: {e}")
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import subprocess
+import multiprocessing
+from code.checkpoint_logic import wal_size_bytes
+from code.load_test import percentile
+
+# What the reader processes run, round robin: the kind of analytic / ad-hoc sqlite3 queries run against gold during a load.
+STRESS_READER_QUERIES = [
+    "SELECT COUNT(*), SUM(amount_paid) FROM payments",
+    "SELECT status, COUNT(*), SUM(balance) FROM invoices GROUP BY status",
+    """SELECT i.customer_id, SUM(p.amount_paid) AS total_paid
+       FROM payments p JOIN invoices i ON p.invoice_id = i.invoice_id
+       GROUP BY i.customer_id ORDER BY total_paid DESC LIMIT 5""",
+    "SELECT aging_bucket, invoice_count, outstanding_balance FROM aging_buckets",
+]
+
+# Gold load settings per scenario. "single" is one transaction per load (the default); "scheduled" commits and
+#      checkpoints as it goes. See scenario_settings for where "scheduled" takes its values from.
+STRESS_SCENARIOS = {
+    "single": {"GOLD_COMMIT_ROWS": "0", "GOLD_COMMIT_SECONDS": "0", "WAL_SIZE_LIMIT_MB": "0"},
+    "scheduled": {"GOLD_COMMIT_ROWS": "1000", "GOLD_COMMIT_SECONDS": "1", "WAL_SIZE_LIMIT_MB": "16"},
+}
+
+
+def scenario_settings(scenario: str) -> dict[str, str]:
+    # "scheduled" uses the GOLD_COMMIT_ROWS / GOLD_COMMIT_SECONDS / WAL_SIZE_LIMIT_MB from the environment (variables.env)
+    #      when any of them is set, so operators can benchmark their own values. Otherwise (all 0) it falls back to its defaults.
+    settings = STRESS_SCENARIOS[scenario]
+    if scenario == "scheduled" and any(float(os.getenv(name) or 0) for name in settings):
+        return {}
+    return settings
+
+def run_stress_client(db_path: str, is_writer: bool, stop_event: multiprocessing.Event, results: multiprocessing.Queue,
+                      busy_timeout: float) -> None:
+    # One reader (or ad-hoc writer) process, looping until stopped. Autocommit, so every statement is its own transaction.
+    # Writers only take and release the write lock (BEGIN IMMEDIATE; COMMIT): their latency is the time spent waiting on the load.
+    conn = sqlite3.connect(db_path, timeout=busy_timeout, isolation_level=None)
+    latencies = []
+    errors = 0
+    request_number = 0
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            if is_writer:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("COMMIT")
+            else:
+                conn.execute(STRESS_READER_QUERIES[request_number % len(STRESS_READER_QUERIES)]).fetchall()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except sqlite3.OperationalError:
+            # "database is locked": the busy timeout ran out.
+            errors += 1
+        request_number += 1
+        if is_writer:
+            time.sleep(0.05)                                 # Ad-hoc writes are occasional, reads are continuous.
+    conn.close()
+    results.put((is_writer, latencies, errors))
+
+def stage_silver_rows(main_path: str, invoice_count: int) -> None:
+    # Generate, ingest and clean a fresh batch, so the gold load under test has invoice_count invoices waiting in silver.
+    env = dict(os.environ, INVOICE_COUNT=str(invoice_count), PAYMENT_COUNT=str(max(1, invoice_count // 4)))
+    for step in ["generate", "ingest", "silver"]:
+        subprocess.run([sys.executable, main_path, step], env=env, cwd=os.path.dirname(main_path), check=True, stdout=subprocess.DEVNULL)
+
+def count_pending_silver_rows(DB_PATH: str) -> int:
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return conn.execute("""
+            SELECT (SELECT COUNT(*) FROM silver_invoices WHERE is_cleaned = 0) + (SELECT COUNT(*) FROM silver_payments WHERE is_cleaned = 0)
+        """).fetchone()[0]
+    finally:
+        conn.close()
+
+def run_stress_scenario(main_path: str, DB_PATH: str, gold_paths: list[str], overrides: dict[str, str], readers: int, writers: int,
+                        invoice_count: int, busy_timeout: float) -> dict:
+    stage_silver_rows(main_path, invoice_count)
+    rows = count_pending_silver_rows(DB_PATH)
+
+    # Step 1: Start the readers and writers, spread over the gold DBs, and give them a moment to connect.
+    stop_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=run_stress_client,
+                                       args=(gold_paths[client % len(gold_paths)], client >= readers, stop_event, results, busy_timeout))
+               for client in range(readers + writers)]
+    for client in clients:
+        client.start()
+    time.sleep(0.5)
+
+    # Step 2: Sample the WAL size (all gold DBs together) while the load runs.
+    load_done = threading.Event()
+    wal_peak = [0]
+
+    def sample_wal() -> None:
+        while not load_done.is_set():
+            wal_peak[0] = max(wal_peak[0], sum(wal_size_bytes(gold_path) for gold_path in gold_paths))
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample_wal)
+    sampler.start()
+
+    # Step 3: The gold load, as its own process, with the scenario's commit settings.
+    start = time.perf_counter()
+    subprocess.run([sys.executable, main_path, "gold"], env=dict(os.environ, **overrides), cwd=os.path.dirname(main_path),
+                   stdout=subprocess.DEVNULL)
+    load_seconds = time.perf_counter() - start
+    load_done.set()
+    sampler.join()
+
+    # Step 4: Stop the clients. Results are drained before joining, so no client blocks on a full queue.
+    stop_event.set()
+    read_latencies, write_latencies, read_errors, write_errors = [], [], 0, 0
+    for _ in clients:
+        is_writer, latencies, errors = results.get()
+        if is_writer:
+            write_latencies.extend(latencies)
+            write_errors += errors
+        else:
+            read_latencies.extend(latencies)
+            read_errors += errors
+    for client in clients:
+        client.join()
+
+    read_latencies.sort()
+    write_latencies.sort()
+    return {"rows": rows, "load_seconds": load_seconds, "reads": len(read_latencies), "read_errors": read_errors,
+            "read_p50": percentile(read_latencies, 50), "read_p99": percentile(read_latencies, 99),
+            "read_max": read_latencies[-1] if read_latencies else 0.0,
+            "write_p99": percentile(write_latencies, 99), "write_errors": write_errors, "wal_peak_bytes": wal_peak[0]}
+
+
+##### Main Function #####
+def run_stress_test(main_path: str, DB_PATH: str, gold_paths: list[str], readers: int, writers: int, invoice_count: int,
+                    scenarios: list[str], busy_timeout: float = 5.0) -> dict[str, dict]:
+    # Run the gold load once per scenario, each on a freshly staged batch, with the same readers/writers hammering gold.
+    results = {}
+    for scenario in scenarios:
+        print(f"Stress scenario '{scenario}': staging {invoice_count} invoices, then loading gold under {readers} readers and {writers} writers...")
+        results[scenario] = run_stress_scenario(main_path, DB_PATH, gold_paths, scenario_settings(scenario), readers, writers,
+                                                invoice_count, busy_timeout)
+
+    # Report
+    print(f"{'scenario':<11}{'rows':>8}{'load_s':>8}{'rows/s':>9}{'reads':>8}{'read_p50':>10}{'read_p99':>10}{'read_max':>10}"
+          f"{'read_err':>10}{'lock_p99':>10}{'lock_err':>10}{'wal_peak_mb':>13}")
+    for scenario, result in results.items():
+        print(f"{scenario:<11}{result['rows']:>8}{result['load_seconds']:>8.1f}{result['rows'] / result['load_seconds']:>9.0f}"
+              f"{result['reads']:>8}{result['read_p50']:>10.1f}{result['read_p99']:>10.1f}{result['read_max']:>10.1f}"
+              f"{result['read_errors']:>10}{result['write_p99']:>10.1f}{result['write_errors']:>10}{result['wal_peak_bytes'] / 1024 / 1024:>13.1f}")
+    print("Latencies in ms. lock_* is how long ad-hoc writers waited for the write lock (lock_err: gave up after the busy timeout).")
+    return results
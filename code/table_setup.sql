@@ -1,5 +1,19 @@
 -- Table Setup of Bronze, Silver and Gold
 
+--------------------------------
+-- Tables added since are created by schema_migrations.sql, which runs after this script (and on every start).
+-- They're dropped here too, so a full re-initialization resets them along with the layers they're built from.
+DROP TABLE IF EXISTS pipeline_metadata;
+DROP TABLE IF EXISTS invoice_aging;
+DROP TABLE IF EXISTS aging_buckets;
+DROP VIEW IF EXISTS bronze_invoices_decoded;
+DROP VIEW IF EXISTS bronze_payments_decoded;
+DROP TABLE IF EXISTS bronze_invoices_compact;
+DROP TABLE IF EXISTS bronze_payments_compact;
+DROP TABLE IF EXISTS bronze_lookup_values;
+DROP TABLE IF EXISTS bronze_load_batches;
+DROP TABLE IF EXISTS bronze_row_hashes;
+
 --------------------------------
 -- BRONZE LAYER: Raw Staging Tables
 DROP TABLE IF EXISTS bronze_invoices;
@@ -35,6 +49,7 @@ CREATE TABLE bronze_payments (
 
 --------------------------------
 -- SILVER LAYER: Cleaned & Validated Tables
+-- Amounts are NUMERIC so they keep integer storage when MONEY_MODE=cents (integer cents), and REAL otherwise.
 DROP TABLE IF EXISTS silver_invoices;
 DROP TABLE IF EXISTS silver_payments;
 
@@ -48,7 +63,7 @@ CREATE TABLE silver_invoices (
     invoice_type TEXT,
     invoice_date TEXT,
     due_date TEXT,
-    amount_due REAL,
+    amount_due NUMERIC,
     currency TEXT,
     status TEXT,
     is_cleaned INTEGER DEFAULT 0
@@ -59,8 +74,8 @@ CREATE TABLE silver_payments (
     invoice_id TEXT,
     due_date TEXT,
     payment_date TEXT,
-    amount_due REAL,
-    amount_paid REAL,
+    amount_due NUMERIC,
+    amount_paid NUMERIC,
     is_cleaned INTEGER DEFAULT 0,
     FOREIGN KEY (invoice_id) REFERENCES silver_invoices(invoice_id)
 );
@@ -95,9 +110,9 @@ CREATE TABLE invoices (
     invoice_type TEXT,
     invoice_date TEXT,
     due_date TEXT,
-    amount_due REAL,
-    amount_paid REAL,
-    balance REAL,
+    amount_due NUMERIC,
+    amount_paid NUMERIC,
+    balance NUMERIC,
     currency TEXT,
     status TEXT,
     created_at TEXT,
@@ -112,7 +127,7 @@ CREATE TABLE payments (
     payment_id TEXT PRIMARY KEY,
     invoice_id TEXT,
     payment_date TEXT,
-    amount_paid REAL,
+    amount_paid NUMERIC,
     FOREIGN KEY (invoice_id) REFERENCES invoices(invoice_id)
 );
 
@@ -124,4 +139,4 @@ CREATE INDEX IF NOT EXISTS idx_gold_payments_invoice_id ON payments(invoice_id);
 
 -- Insert Department values
 INSERT INTO departments (department_name)
-VALUES ('Sales'), ('Professional Services'),('HR'),('IT'),('Customer Success');
\ No newline at end of file
+VALUES ('Sales'), ('Professional Services'),('HR'),('IT'),('Customer Success');
@@ -1,11 +1,14 @@
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
 import shutil
 import sqlite3
-from code.invoice_payment_gen import invoices_payments_data_gen
-from code.bronze_logic import ingestion_start, check_or_create_tables
-from code.silver_logic import move_bronze_to_silver
-from code.gold_logic import move_silver_to_gold
+
+# Heavy libraries (pandas, Faker, matplotlib) are only imported inside the subcommand that needs them,
+#      so small incremental runs (e.g. "python3 main.py silver" from cron) don't pay for them at startup.
+# The *_IMPORTS list above each handler names the modules its imports load. --startup-only (and so bench) imports that list,
+#      so keep it in step with the handler's imports. Libraries a module only loads on first use (pandas, pyplot) aren't listed.
 
 # Load environment variables
 load_dotenv('variables.env')
@@ -15,15 +18,59 @@ RAW_DATA_FOLDER = os.getenv('RAW_DATA_FOLDER')
 PROCESSED_FOLDER = os.getenv('PROCESSED_FOLDER')
 DB_PATH = os.getenv('DB_PATH')
 TABLE_SETUP_PATH = os.getenv('TABLE_SETUP_PATH')
+SCHEMA_MIGRATIONS_PATH = os.getenv('SCHEMA_MIGRATIONS_PATH', './code/schema_migrations.sql')
 DEPARTMENT_MAPPINGS_PATH = os.getenv('DEPARTMENT_MAPPINGS_PATH')
+ARCHIVE_FOLDER = os.getenv('ARCHIVE_FOLDER')
 expected_tables = ["bronze_invoices", "bronze_payments", "silver_invoices", "silver_payments", "customers", "departments", "invoices"]
 
+# Bronze Storage: "raw" keeps every column as text, "compact" dictionary-encodes low-cardinality columns.
+BRONZE_STORAGE_MODE = os.getenv('BRONZE_STORAGE_MODE', 'raw')
+BRONZE_RETENTION_MODE = os.getenv('BRONZE_RETENTION_MODE', 'archive')
+
+# Bronze duplicate detection: a Bloom filter persisted at BRONZE_DEDUP_FILTER_PATH, sized for BRONZE_DEDUP_EXPECTED_ROWS rows
+#      at BRONZE_DEDUP_FALSE_POSITIVE_RATE, backed by the exact bronze_row_hashes index. "off" ingests every row as before.
+BRONZE_DEDUP = os.getenv('BRONZE_DEDUP', 'on')
+BRONZE_DEDUP_FILTER_PATH = os.getenv('BRONZE_DEDUP_FILTER_PATH', './db/bronze_rows.bloom')
+BRONZE_DEDUP_EXPECTED_ROWS = int(os.getenv('BRONZE_DEDUP_EXPECTED_ROWS', '10000000'))
+BRONZE_DEDUP_FALSE_POSITIVE_RATE = float(os.getenv('BRONZE_DEDUP_FALSE_POSITIVE_RATE', '0.01'))
+
+# Gold sharding: customers (and their invoices/payments) are routed by customer_id hash into this many gold DB files.
+# 1 keeps gold in DB_PATH. Fixed when the DB is created.
+GOLD_SHARD_COUNT = int(os.getenv('GOLD_SHARD_COUNT', '1'))
+
+# Gold load commit interval (opt-in): commit every GOLD_COMMIT_ROWS rows and/or GOLD_COMMIT_SECONDS seconds instead of one
+#      transaction per load, and reset the WAL (truncating checkpoint) once it's over WAL_SIZE_LIMIT_MB. 0 disables a setting.
+#      Off by default: with it on a load is no longer atomic, and each interim commit bumps the gold version.
+GOLD_COMMIT_ROWS = int(os.getenv('GOLD_COMMIT_ROWS', '0'))
+GOLD_COMMIT_SECONDS = float(os.getenv('GOLD_COMMIT_SECONDS', '0'))
+WAL_SIZE_LIMIT_MB = int(os.getenv('WAL_SIZE_LIMIT_MB', '0'))
+
+# Money: "float" stores dollars as REAL, "cents" stores exact integer cents in silver and gold. Fixed when the DB is created.
+MONEY_MODE = os.getenv('MONEY_MODE', 'float')
+
+# Query Service
+QUERY_SERVICE_HOST = os.getenv('QUERY_SERVICE_HOST', '127.0.0.1')
+QUERY_SERVICE_PORT = int(os.getenv('QUERY_SERVICE_PORT', '8050'))
+QUERY_SERVICE_POOL_SIZE = int(os.getenv('QUERY_SERVICE_POOL_SIZE', '4'))
+
+# Reports: headless PNG charts, at most REPORT_MAX_POINTS points per series, rendered by up to REPORT_WORKERS processes.
+REPORTS_FOLDER = os.getenv('REPORTS_FOLDER', './reports/')
+REPORT_MAX_POINTS = int(os.getenv('REPORT_MAX_POINTS', '500'))
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '4'))
+
+# Query cache shared by analyze and report (same folder and DB namespace), reused until the gold version changes.
+QUERY_CACHE_FOLDER = os.getenv('QUERY_CACHE_FOLDER')
+QUERY_CACHE_MEMORY_ENTRIES = int(os.getenv('QUERY_CACHE_MEMORY_ENTRIES', '64'))
+QUERY_CACHE_DISK_ENTRIES = int(os.getenv('QUERY_CACHE_DISK_ENTRIES', '256'))
+
 # Data Gen
 chaos_threshold = os.getenv('CHAOS_THRESHOLD')
 invoice_count = os.getenv('INVOICE_COUNT')
 payment_count = os.getenv('PAYMENT_COUNT')
 
 
+GENERATE_IMPORTS = ["code.invoice_payment_gen"]
+
 def generate_invoices_payments_data() -> None:
     """
     Generate raw invoices and payments data using the fake data generator via Faker library.
@@ -34,6 +81,8 @@ def generate_invoices_payments_data() -> None:
     """
 
     try:
+        from code.invoice_payment_gen import invoices_payments_data_gen
+
         # Generate raw data
         invoices_payments_data_gen(chaos_threshold, invoice_count, payment_count)
         print("------")
@@ -41,6 +90,8 @@ def generate_invoices_payments_data() -> None:
     except Exception as e:
         print(f"Error: While generating invoices and payments data: {e}")
 
+INIT_SCHEMA_IMPORTS = ["code.bronze_logic", "code.money_logic", "code.shard_logic"]
+
 def check_or_create_db_tables() -> None:
     """
     Check if the required SQLite database tables exist, and create them if necessary.
@@ -50,6 +101,10 @@ def check_or_create_db_tables() -> None:
     If any errors occur during the process, they are caught and printed.
     """
 
+    from code.bronze_logic import check_or_create_tables, apply_schema_migrations
+    from code.money_logic import initialize_money_mode
+    from code.shard_logic import initialize_gold_shard_count, initialize_gold_shards, gold_shard_paths
+
     conn = None                                              # In case something happens in the middle of the try block.
     try:
         # Create DB connection and cursor
@@ -59,8 +114,25 @@ def check_or_create_db_tables() -> None:
         # Enable foreign key support
         cursor.execute("PRAGMA foreign_keys = ON;")
 
+        # WAL journal (persistent in the DB file): readers such as the query service keep reading while the pipeline writes.
+        cursor.execute("PRAGMA journal_mode = WAL;")
+
         # Check or create new tables. Expected 1st run create. After only check.
         check_or_create_tables(conn, cursor, TABLE_SETUP_PATH, expected_tables)
+
+        # Add tables introduced since (IF NOT EXISTS). Runs every time, so existing databases are upgraded in place.
+        apply_schema_migrations(conn, SCHEMA_MIGRATIONS_PATH)
+
+        # Record the money mode on a fresh database. Existing databases keep the mode they were created with.
+        money_mode = initialize_money_mode(cursor, MONEY_MODE)
+        shard_count = initialize_gold_shard_count(cursor, GOLD_SHARD_COUNT)
+        conn.commit()
+        print(f"Money mode: {money_mode}")
+
+        # Sharded gold: every shard file gets the same schema and money mode.
+        if shard_count > 1:
+            initialize_gold_shards(gold_shard_paths(DB_PATH, shard_count), TABLE_SETUP_PATH, SCHEMA_MIGRATIONS_PATH, expected_tables, money_mode)
+            print(f"Gold shards checked/created: {shard_count}")
         print("Tables checked/created successfully.")
         print("------")
 
@@ -73,16 +145,21 @@ def check_or_create_db_tables() -> None:
         if conn:
             conn.close()
 
+INGEST_IMPORTS = ["code.bronze_logic"]
+
 def ingest_new_files_to_bronze() -> None:
     """
     Ingest new CSV files from the raw data folder into the bronze layer.
 
     This function searches for CSV files in the RAW_DATA_FOLDER that contain 'invoices' or 'payments' in their name,
          then processes them by calling the ingestion_start function.
-    The ingestion_start function reads the files and mass ingests into bronze layer.
+    The ingestion_start function reads the files and mass ingests into bronze layer, dropping rows already ingested
+         (unless BRONZE_DEDUP=off).
     After processing, the files are moved to the PROCESSED_FOLDER. If no files are found, a message is printed.
     """
 
+    from code.bronze_logic import ingestion_start
+
     conn = None                                              # In case something happens in the middle of the try block.
     try:
         # First check if there are any expected raw files
@@ -96,7 +173,9 @@ def ingest_new_files_to_bronze() -> None:
             cursor = conn.cursor()
 
             # Move raw files into SQLite DB bronze layer
-            ingestion_start(conn, cursor, RAW_DATA_FOLDER, DB_PATH, TABLE_SETUP_PATH)
+            ingestion_start(conn, cursor, RAW_DATA_FOLDER, DB_PATH, TABLE_SETUP_PATH, BRONZE_STORAGE_MODE,
+                            BRONZE_DEDUP_FILTER_PATH if BRONZE_DEDUP == "on" else None,
+                            BRONZE_DEDUP_EXPECTED_ROWS, BRONZE_DEDUP_FALSE_POSITIVE_RATE)
 
             # Move processed files to /data/processed folder
             for filename in files_to_process:
@@ -120,6 +199,8 @@ def ingest_new_files_to_bronze() -> None:
         if conn:
             conn.close()
 
+SILVER_IMPORTS = ["code.silver_logic"]
+
 def move_new_bronze_records_to_silver() -> None:
     """
     Move newly processed bronze records to the silver table.
@@ -130,6 +211,8 @@ def move_new_bronze_records_to_silver() -> None:
     Any errors encountered during the process are printed.
     """
 
+    from code.silver_logic import move_bronze_to_silver
+
     conn = None                                              # In case something happens in the middle of the try block.
     try:
         # Create DB connection and cursor
@@ -149,6 +232,8 @@ def move_new_bronze_records_to_silver() -> None:
         if conn:
             conn.close()
 
+GOLD_IMPORTS = ["code.gold_logic", "code.shard_logic"]
+
 def move_new_silver_records_to_gold() -> None:
     """
     Move newly processed silver records to the gold layer.
@@ -156,9 +241,14 @@ def move_new_silver_records_to_gold() -> None:
     This function iterates through the silver layer for records with is_cleaned = 0. Then extracts and sends the data to their
           respective tables. (Customer, Department, Invoices and Payments)
     It utilizes a department mappings JSON file to map department names correctly during the transfer.
+    The load is one transaction, unless GOLD_COMMIT_ROWS / GOLD_COMMIT_SECONDS are set: then it commits at those intervals, so it
+         doesn't hold the write lock or grow the WAL for its whole length (see code/checkpoint_logic.py).
     If any errors occur during the process, they are caught and printed.
     """
 
+    from code.gold_logic import move_silver_to_gold
+    from code.shard_logic import get_gold_db_paths
+
     conn = None                                              # In case something happens in the middle of the try block.
     try:
         # Create DB connection and cursor
@@ -166,7 +256,9 @@ def move_new_silver_records_to_gold() -> None:
         cursor = conn.cursor()
 
         # Run the function to move data from silver to gold
-        move_silver_to_gold(conn, cursor, DEPARTMENT_MAPPINGS_PATH)
+        # With GOLD_SHARD_COUNT > 1 there's one writer process per shard.
+        move_silver_to_gold(conn, cursor, DEPARTMENT_MAPPINGS_PATH, get_gold_db_paths(cursor, DB_PATH),
+                            GOLD_COMMIT_ROWS, GOLD_COMMIT_SECONDS, WAL_SIZE_LIMIT_MB)
         print("------")
 
     except sqlite3.Error as e:
@@ -180,18 +272,238 @@ def move_new_silver_records_to_gold() -> None:
 
 
 
-if __name__ == "__main__":
+AGING_IMPORTS = ["datetime", "code.aging_logic", "code.shard_logic"]
+
+def refresh_receivables_aging(args: argparse.Namespace) -> None:
     """
-    Main entry point for the data processing pipeline.
+    Refresh invoice statuses and receivables aging buckets, then print the aging report.
 
-    This script is responsible for:
-    1. Generating raw invoices and payments data.
-    2. Checking and creating necessary database tables.
-    3. Ingesting new CSV files from the raw data folder into the bronze layer.
-    4. Moving cleaned and enriched bronze records to the silver layer.
-    5. Moving records in silver layer to gold layer.
+    Only invoices whose due date crossed a bucket boundary since the last refresh are touched (see code/aging_logic.py).
+    Those that just went past due are marked "Late" in gold. The report reads the per-bucket running totals.
+    If any errors occur during the process, they are caught and printed.
+    """
 
-    Each of these steps is executed in sequence with error handling in place.
+    from datetime import date
+    from code.aging_logic import refresh_invoice_aging, receivables_aging_report
+    from code.shard_logic import get_gold_db_paths
+
+    conn = None                                              # In case something happens in the middle of the try block.
+    try:
+        # Create DB connection and cursor
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        # Refresh aging as of today (or --as-of) in every gold DB, adding up the per-bucket totals for the report.
+        as_of = date.fromisoformat(args.as_of) if getattr(args, "as_of", None) else None
+        report = {}
+        for gold_path in get_gold_db_paths(cursor, DB_PATH):
+            gold_conn = conn if gold_path == DB_PATH else sqlite3.connect(gold_path)
+            try:
+                refresh_invoice_aging(gold_conn, gold_conn.cursor(), as_of)
+                for bucket, invoice_count, outstanding_balance in receivables_aging_report(gold_conn.cursor()):
+                    bucket_count, bucket_balance = report.get(bucket, (0, 0))
+                    report[bucket] = (bucket_count + invoice_count, bucket_balance + (outstanding_balance or 0))
+            finally:
+                if gold_conn is not conn:
+                    gold_conn.close()
+
+        # Receivables aging report
+        print(f"{'aging_bucket':<14}{'invoices':>10}{'outstanding_balance':>22}")
+        for bucket, (invoice_count, outstanding_balance) in report.items():
+            print(f"{bucket:<14}{invoice_count:>10}{outstanding_balance:>22,.2f}")
+        print("------")
+
+    except sqlite3.Error as e:
+        print(f"Error: SQLite error in refresh_receivables_aging: {e}")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        # Ensure connection is closed even if there's an error
+        if conn:
+            conn.close()
+
+RETENTION_IMPORTS = ["code.retention_logic"]
+
+def apply_retention(args: argparse.Namespace) -> None:
+    """
+    Keep DB and disk size from growing linearly with every load.
+
+    This function gzips the CSVs in the PROCESSED_FOLDER, then archives (to ARCHIVE_FOLDER) or prunes the bronze rows
+         that were already promoted to silver (is_cleaned = 1). With --vacuum the freed space is handed back to the filesystem.
+    If any errors occur during the process, they are caught and printed.
+    """
+
+    from code.retention_logic import compress_processed_files, prune_promoted_bronze_rows
+
+    conn = None                                              # In case something happens in the middle of the try block.
+    try:
+        # Compress processed raw files
+        compress_processed_files(PROCESSED_FOLDER)
+
+        # Create DB connection and cursor
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        # Archive or prune bronze rows already promoted to silver
+        prune_promoted_bronze_rows(conn, cursor, ARCHIVE_FOLDER, args.mode, args.vacuum)
+        print("------")
+
+    except sqlite3.Error as e:
+        print(f"Error: SQLite error in apply_retention: {e}")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        # Ensure connection is closed even if there's an error
+        if conn:
+            conn.close()
+
+def get_gold_paths() -> list[str]:
+    # Every DB file holding gold tables (just DB_PATH unless gold is sharded).
+    from code.shard_logic import get_gold_db_paths
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return get_gold_db_paths(conn.cursor(), DB_PATH)
+    finally:
+        conn.close()
+
+SERVE_IMPORTS = ["code.query_service", "code.shard_logic"]
+
+def serve_queries(args: argparse.Namespace) -> None:
+    """
+    Serve the reconciliation questions over local HTTP/JSON until interrupted.
+
+    Endpoints: /customers/top?limit=N, /payments/status, /departments/revenue, /payments/average, /payments/daily,
+         /invoices/<invoice_id> and /health. Reads go through a pool of read-only connections and a response cache
+         keyed on the gold version (see code/query_service.py).
+    """
+
+    from code.query_service import start_query_service
+
+    server, service = start_query_service(get_gold_paths(), QUERY_SERVICE_HOST, args.port, QUERY_SERVICE_POOL_SIZE)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Query service stopped.")
+    finally:
+        server.server_close()
+        service.close()
+
+LOADTEST_IMPORTS = ["threading", "code.load_test", "code.query_service", "code.shard_logic"]
+
+def run_query_load_test(args: argparse.Namespace) -> None:
+    """
+    Measure query service p50/p99 latency under concurrent clients, optionally while the pipeline is writing.
+
+    Without --url, a query service is started in the background on a free port. With --with-writes, the full pipeline
+         runs in a loop next to the clients, so reads are measured while gold loads land.
+    """
+
+    import threading
+    from code.load_test import run_load_test
+    from code.query_service import start_query_service
+
+    gold_paths = get_gold_paths()
+    server, service = None, None
+    base_url = args.url
+    if not base_url:
+        server, service = start_query_service(gold_paths, "127.0.0.1", 0, QUERY_SERVICE_POOL_SIZE)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        run_load_test(base_url, gold_paths, args.clients, args.duration,
+                      os.path.abspath(__file__) if args.with_writes else None, args.write_invoices)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+STRESS_IMPORTS = ["code.stress_logic", "code.shard_logic"]
+
+def run_stress_benchmark(args: argparse.Namespace) -> None:
+    """
+    Measure gold load throughput and concurrent reader latency, with and without the commit/checkpoint scheduler.
+
+    For each scenario a fresh batch of --invoices invoices is generated and moved to silver, then the gold load runs while
+         --readers processes query gold and --writers processes take the write lock now and then (like an ad-hoc session).
+         "single" loads in one transaction, "scheduled" uses GOLD_COMMIT_ROWS / GOLD_COMMIT_SECONDS / WAL_SIZE_LIMIT_MB
+         when set, otherwise 1000 rows / 1 second / 16 MB.
+    Like "loadtest --with-writes", this adds the generated data to the database.
+    """
+
+    from code.stress_logic import run_stress_test
+
+    scenarios = ["single", "scheduled"] if args.scenario == "both" else [args.scenario]
+    run_stress_test(os.path.abspath(__file__), DB_PATH, get_gold_paths(), args.readers, args.writers, args.invoices, scenarios)
+
+ANALYZE_IMPORTS = ["analysis"]
+
+def run_analysis() -> None:
+    """
+    Run the sample business queries and visualizations from analysis.py.
+
+    pandas and matplotlib are only imported here, so the pipeline subcommands never load them.
+    """
+
+    from analysis import run_analysis as run_sample_analysis
+    run_sample_analysis()
+
+REPORT_IMPORTS = ["code.money_logic", "code.query_cache", "code.report_logic", "code.shard_logic"]
+
+def generate_reports(args: argparse.Namespace) -> None:
+    """
+    Render the report charts (payment trends, payment status, department revenue, receivables aging) as PNGs into REPORTS_FOLDER.
+
+    Works without a display. Payment trends are summed in SQLite per day, week or month depending on the length of the
+         date range, then downsampled to at most --max-points points, so report time doesn't grow with history.
+         The charts are rendered in parallel processes (see code/report_logic.py).
+    Aggregates are read through the query cache (shared with "analyze"), so repeated reports are served from it
+         until the gold loader lands new data.
+    If any errors occur during the process, they are caught and printed.
+    """
+
+    from code.money_logic import get_money_mode
+    from code.query_cache import QueryCache
+    from code.report_logic import generate_report
+    from code.shard_logic import get_gold_db_paths, open_gold_connections, get_combined_gold_version
+
+    conn = None                                              # In case something happens in the middle of the try block.
+    gold_connections = []
+    try:
+        # Create DB connection, plus one per gold shard when sharded.
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        gold_paths = get_gold_db_paths(cursor, DB_PATH)
+        gold_connections = [conn] if gold_paths == [DB_PATH] else open_gold_connections(gold_paths)
+
+        # Query cache: results are reused until the gold loader bumps the gold version.
+        cache = QueryCache(QUERY_CACHE_FOLDER, max_memory_entries=QUERY_CACHE_MEMORY_ENTRIES, max_disk_entries=QUERY_CACHE_DISK_ENTRIES,
+                           namespace=os.path.abspath(DB_PATH))
+        gold_version = get_combined_gold_version(gold_connections)
+
+        generate_report(gold_connections, get_money_mode(cursor), REPORTS_FOLDER, args.start, args.end, args.max_points,
+                        args.workers, cache, gold_version)
+        print(f"Query cache: {cache.hits} hits, {cache.misses} misses (gold version {gold_version}).")
+
+    except sqlite3.Error as e:
+        print(f"Error: SQLite error in generate_reports: {e}")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        # Ensure connections are closed even if there's an error
+        for gold_conn in gold_connections:
+            if gold_conn is not conn:
+                gold_conn.close()
+        if conn:
+            conn.close()
+
+def run_full_pipeline() -> None:
+    """
+    Run every pipeline step in sequence: generate, init-schema, ingest, silver, gold, aging.
+
+    This is what "python3 main.py" does when no subcommand is given.
     """
 
     # Create fake data to be dropped off at data/raw folder.
@@ -207,4 +519,121 @@ if __name__ == "__main__":
     move_new_bronze_records_to_silver()
 
     # Silver to Gold.
-    move_new_silver_records_to_gold()
\ No newline at end of file
+    move_new_silver_records_to_gold()
+
+    # Age receivables and mark newly past due invoices Late.
+    refresh_receivables_aging(argparse.Namespace())
+
+BENCH_IMPORTS = ["code.bench_logic"]
+
+def run_startup_bench(args: argparse.Namespace) -> None:
+    """
+    Measure the startup time of every subcommand.
+
+    Each subcommand is started in a fresh interpreter with --startup-only, which performs the subcommand's imports
+         and exits without touching any data. The median wall time over --repeat runs is reported.
+    """
+
+    from code.bench_logic import measure_startup
+    measure_startup(os.path.abspath(__file__), [name for name in SUBCOMMANDS if name != "bench"], args.repeat)
+
+
+# Subcommand name -> (handler, modules it imports, help text).
+# The module lists are defined next to their handlers (see the *_IMPORTS lists above), which is what --startup-only imports.
+SUBCOMMANDS = {
+    "generate": (lambda args: generate_invoices_payments_data(), GENERATE_IMPORTS,
+                 "Generate raw invoices and payments CSVs into RAW_DATA_FOLDER."),
+    "init-schema": (lambda args: check_or_create_db_tables(), INIT_SCHEMA_IMPORTS,
+                    "Create the Bronze, Silver and Gold tables if they don't exist."),
+    "ingest": (lambda args: ingest_new_files_to_bronze(), INGEST_IMPORTS,
+               "Load new raw CSVs into the bronze tables and move them to PROCESSED_FOLDER."),
+    "silver": (lambda args: move_new_bronze_records_to_silver(), SILVER_IMPORTS,
+               "Clean and move new bronze records into the silver tables."),
+    "gold": (lambda args: move_new_silver_records_to_gold(), GOLD_IMPORTS,
+             "Move new silver records into the gold tables."),
+    "aging": (refresh_receivables_aging, AGING_IMPORTS,
+              "Refresh invoice Late statuses and receivables aging buckets, then print the aging report."),
+    "retention": (apply_retention, RETENTION_IMPORTS,
+                  "Compress processed CSVs and archive/prune bronze rows already promoted to silver."),
+    "analyze": (lambda args: run_analysis(), ANALYZE_IMPORTS,
+                "Run the sample business queries and charts."),
+    "report": (generate_reports, REPORT_IMPORTS,
+               "Render the report charts headlessly as PNGs into REPORTS_FOLDER."),
+    "serve": (serve_queries, SERVE_IMPORTS,
+              "Serve the reconciliation questions over local HTTP/JSON from read-only pooled connections."),
+    "loadtest": (run_query_load_test, LOADTEST_IMPORTS,
+                 "Report query service p50/p99 latency under concurrent clients, optionally while the pipeline writes."),
+    "stress": (run_stress_benchmark, STRESS_IMPORTS,
+               "Benchmark the gold load against concurrent reader/writer processes, with and without commit scheduling."),
+    "bench": (run_startup_bench, BENCH_IMPORTS,
+              "Measure startup time of every subcommand."),
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Invoices and payments reconciliation pipeline. Runs every step when no subcommand is given.")
+    parser.add_argument("--startup-only", action="store_true", help="Import what the subcommand needs and exit. Used by bench.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    for name, (handler, modules, help_text) in SUBCOMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if name == "bench":
+            subparser.add_argument("--repeat", type=int, default=5, help="Number of runs per subcommand (median is reported).")
+        elif name == "aging":
+            subparser.add_argument("--as-of", help="Age as of this date (YYYY-MM-DD). Defaults to today.")
+        elif name == "serve":
+            subparser.add_argument("--port", type=int, default=QUERY_SERVICE_PORT, help="Port to listen on (host is QUERY_SERVICE_HOST).")
+        elif name == "loadtest":
+            subparser.add_argument("--url", help="Base URL of a running query service. Defaults to starting one in the background.")
+            subparser.add_argument("--clients", type=int, default=8, help="Number of concurrent clients.")
+            subparser.add_argument("--duration", type=float, default=20, help="Test length in seconds.")
+            subparser.add_argument("--with-writes", action="store_true", help="Run the full pipeline in a loop during the test.")
+            subparser.add_argument("--write-invoices", type=int, default=2000, help="Invoices generated per pipeline run with --with-writes.")
+        elif name == "retention":
+            subparser.add_argument("--mode", choices=["archive", "prune"], default=BRONZE_RETENTION_MODE,
+                                   help="Archive promoted bronze rows to ARCHIVE_FOLDER before deleting them, or just delete them.")
+            subparser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards to shrink the file.")
+        elif name == "stress":
+            subparser.add_argument("--readers", type=int, default=4, help="Reader processes querying gold during the load.")
+            subparser.add_argument("--writers", type=int, default=1, help="Processes periodically taking the write lock during the load.")
+            subparser.add_argument("--invoices", type=int, default=20000, help="Invoices generated and loaded per scenario.")
+            subparser.add_argument("--scenario", choices=["single", "scheduled", "both"], default="both",
+                                   help="Gold load in one transaction, with the commit scheduler, or both.")
+        elif name == "report":
+            subparser.add_argument("--start", help="First payment date of the trends chart (YYYY-MM-DD). Defaults to the first payment.")
+            subparser.add_argument("--end", help="Last payment date of the trends chart (YYYY-MM-DD). Defaults to the last payment.")
+            subparser.add_argument("--max-points", type=int, default=REPORT_MAX_POINTS, help="Maximum points plotted per series.")
+            subparser.add_argument("--workers", type=int, default=REPORT_WORKERS, help="Charts rendered in parallel.")
+
+    return parser
+
+
+if __name__ == "__main__":
+    """
+    Main entry point for the data processing pipeline.
+
+    With no subcommand, this script is responsible for:
+    1. Generating raw invoices and payments data.
+    2. Checking and creating necessary database tables.
+    3. Ingesting new CSV files from the raw data folder into the bronze layer.
+    4. Moving cleaned and enriched bronze records to the silver layer.
+    5. Moving records in silver layer to gold layer.
+    6. Refreshing invoice Late statuses and receivables aging.
+
+    Each of these steps is executed in sequence with error handling in place.
+    Each step can also be run on its own via its subcommand (see "python3 main.py --help").
+    """
+
+    args = build_parser().parse_args()
+
+    if args.startup_only:
+        # Only pay the import cost of the subcommand, then exit.
+        import importlib
+        pipeline_steps = ["generate", "init-schema", "ingest", "silver", "gold", "aging"]
+        for module in (SUBCOMMANDS[args.command][1] if args.command else sum((SUBCOMMANDS[step][1] for step in pipeline_steps), [])):
+            importlib.import_module(module)
+        sys.exit(0)
+
+    if args.command is None:
+        run_full_pipeline()
+    else:
+        SUBCOMMANDS[args.command][0](args)